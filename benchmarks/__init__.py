@@ -0,0 +1 @@
+"""Performance benchmarks for the game engine and players. Run with: python -m benchmarks --help"""
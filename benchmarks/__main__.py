@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from game.bitboard import BitboardMartianChessBoard
+from game.board import MartianChessBoard
+
+
+BOARD_CLASSES = {"list": MartianChessBoard, "bitboard": BitboardMartianChessBoard}
+BENCHMARKS = ["perft", "search", "games", "inference", "learn"]
+
+
+def get_metadata():
+    """Describes the machine and code version a run was made on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(names, board_classes, quick: bool = False, seed: int = 0):
+    """Runs the named benchmarks, returning a dictionary of results keyed by benchmark/variant"""
+    results = {}
+    def record(key, function, *args, **kwargs):
+        print(f"Running {key}...", file=sys.stderr)
+        results[key] = function(*args, **kwargs)
+
+    for board_name in board_classes:
+        board_class = BOARD_CLASSES[board_name]
+        if "perft" in names:
+            from benchmarks.perft import bench_perft
+            record(f"perft/{board_name}", bench_perft, 4 if quick or board_name == "list" else 5, board_class)
+        if "search" in names:
+            from benchmarks.search import bench_depthsearch
+            record(f"search/minimax/{board_name}", bench_depthsearch, 2 if quick else 3, False, board_class, seed=seed)
+            record(f"search/alpha_beta/{board_name}", bench_depthsearch, 3 if quick else 4, True, board_class, seed=seed)
+        if "games" in names:
+            from benchmarks.games import bench_random_games, bench_random_playouts
+            record(f"games/random_vs_random/{board_name}", bench_random_games, 50 if quick else 200, board_class, seed)
+            record(f"games/random_playouts/{board_name}", bench_random_playouts, 200 if quick else 2000, board_class, seed)
+
+    if "inference" in names: # Neural network benchmarks only import torch if they are requested
+        from benchmarks.neuralnet import bench_inference
+        moves = 500 if quick else 2000
+        record("inference/default", bench_inference, moves, seed=seed)
+        record("inference/fast", bench_inference, moves, True, seed=seed)
+        record("inference/fast_traced", bench_inference, moves, True, True, seed=seed)
+    if "learn" in names:
+        from benchmarks.neuralnet import bench_learn
+        games = 5 if quick else 20
+        record("learn/default", bench_learn, games, seed=seed)
+        record("learn/batched", bench_learn, games, True, seed=seed)
+    return results
+
+
+def compare(results, baseline):
+    """Prints the change of every rate and latency relative to a previous run"""
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric, value in result.items():
+            old = baseline[key].get(metric)
+            if not (metric.endswith("_per_sec") or metric.endswith("_us") or metric.endswith("_ms_per_game")) or not old:
+                continue
+            print(f"{key} {metric}: {old:.6g} -> {value:.6g} ({value / old:.2f}x)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run performance benchmarks and write machine readable results.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark", help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)}).")
+    parser.add_argument("--board", nargs="+", choices=list(BOARD_CLASSES), default=list(BOARD_CLASSES), help="Board backends to benchmark (default: all).")
+    parser.add_argument("--quick", action="store_true", help="Use smaller sizes, for a fast smoke test.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for positions and players (default: 0).")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--compare", type=str, default=None, help="A previous JSON results file to compare rates and latencies with.")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))} (choose from {', '.join(BENCHMARKS)})")
+
+    results = run_benchmarks(args.benchmarks or BENCHMARKS, args.board, args.quick, args.seed)
+    report = {"metadata": get_metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+        print(f"Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=4))
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file)["results"])
+
+    # Perft counts are correctness baselines, so a mismatch fails the run
+    if any(result.get("baseline_matches") is False for key, result in results.items() if key.startswith("perft/")):
+        print("Perft counts do not match the recorded baselines", file=sys.stderr)
+        sys.exit(1)
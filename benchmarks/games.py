@@ -0,0 +1,57 @@
+import random
+import time
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.referee import MartianChessReferee
+from game.stats import RefereeStats
+from players.rand.player import RandomPlayer
+
+
+def bench_random_games(games: int = 200, board_class: type = MartianChessBoard, seed: int = 0):
+    """Plays RandomPlayer against RandomPlayer through the referee, returning games/sec and where the time went"""
+    random.seed(seed)
+    stats = RefereeStats()
+    referee = MartianChessReferee(RandomPlayer(), RandomPlayer(), display_board=False, board_class=board_class, stats=stats)
+    for _ in range(games):
+        referee.play_round()
+    result = stats.to_dict()
+    return {
+        "games": games,
+        "games_per_sec": result["games_per_sec"],
+        "moves_per_sec": result["moves_per_sec"],
+        "average_moves": result["average_moves"],
+        "options_time": result["options_time"],
+        "make_move_time": result["make_move_time"],
+        "game_over_time": result["game_over_time"],
+        "player_time": result["top_time"] + result["bottom_time"],
+        "seconds": result["elapsed"],
+    }
+
+
+def bench_random_playouts(games: int = 2000, board_class: type = MartianChessBoard, seed: int = 0):
+    """Plays random moves straight on a board (options, make_move and is_game_over per position, no referee or players), returning positions/sec"""
+    rng = random.Random(seed)
+    board = board_class()
+    positions = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        board.reset_board()
+        player = PlayerID.BOTTOM
+        for _ in range(200):
+            options = board.get_player_options(player)
+            positions += 1
+            if not options:
+                break
+            option = options[rng.randrange(len(options))]
+            board.make_move(player, option[0], option[1], option[2], option[3])
+            if board.is_game_over():
+                break
+            player = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+    seconds = time.perf_counter() - start
+    return {
+        "games": games,
+        "positions": positions,
+        "positions_per_sec": positions / seconds if seconds > 0 else 0.0,
+        "seconds": seconds,
+    }
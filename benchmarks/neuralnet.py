@@ -0,0 +1,79 @@
+import random
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.positions import get_benchmark_positions
+from game.board import MartianChessBoard
+from game.referee import MartianChessReferee
+from game.snapshot import BoardSnapshot
+from players.neuralnet.player import NeuralnetPlayer
+from players.rand.player import RandomPlayer
+
+
+def _latency_stats(samples):
+    """Summarizes a list of per-call times in seconds as microseconds"""
+    samples = np.array(samples) * 1e6
+    return {
+        "calls": len(samples),
+        "mean_us": float(samples.mean()),
+        "median_us": float(np.median(samples)),
+        "p95_us": float(np.percentile(samples, 95)),
+    }
+
+
+def bench_inference(moves: int = 2000, fast_inference: bool = False, trace_network: bool = False, seed: int = 0):
+    """Times NeuralnetPlayer.make_move over the benchmark positions, returning per-move latency"""
+    random.seed(seed)
+    torch.manual_seed(seed)
+    player = NeuralnetPlayer(fast_inference=fast_inference, trace_network=trace_network, learning_rate=0, logging_enabled=False)
+    board = MartianChessBoard()
+    calls = []
+    for pieces, player_id, points in get_benchmark_positions(32, seed):
+        board.set_board(pieces)
+        calls.append((BoardSnapshot.from_board(pieces), board.get_player_options(player_id), player_id, points[player_id]))
+
+    # Warm up once per position, so one-off costs such as tracing are not measured
+    for call in calls:
+        player.make_move(*call)
+    player.game_memory.clear()
+
+    samples = []
+    for i in range(moves):
+        start = time.perf_counter()
+        player.make_move(*calls[i % len(calls)])
+        samples.append(time.perf_counter() - start)
+        if len(player.game_memory) > 256:
+            player.game_memory.clear() # Keep memory use flat, make_move records a transition per call
+    result = _latency_stats(samples)
+    result.update({"fast_inference": fast_inference, "trace_network": trace_network})
+    return result
+
+
+def bench_learn(games: int = 20, batch_learning: bool = False, seed: int = 0):
+    """Plays NeuralnetPlayer against RandomPlayer and times the learning done in game_over, returning time per game"""
+    random.seed(seed)
+    torch.manual_seed(seed)
+    player = NeuralnetPlayer(batch_learning=batch_learning, logging_enabled=False)
+    samples = []
+    moves = []
+    game_over = player.game_over
+    def timed_game_over(winner, score):
+        moves.append(len(player.game_memory))
+        start = time.perf_counter()
+        game_over(winner, score)
+        samples.append(time.perf_counter() - start)
+    player.game_over = timed_game_over
+
+    referee = MartianChessReferee(player, RandomPlayer(), display_board=False)
+    for _ in range(games):
+        referee.play_round()
+    result = _latency_stats(samples)
+    result.update({
+        "batch_learning": batch_learning,
+        "games": games,
+        "average_transitions": float(np.mean(moves)),
+        "mean_ms_per_game": result["mean_us"] / 1000,
+    })
+    return result
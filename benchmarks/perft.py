@@ -0,0 +1,49 @@
+import time
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+
+
+# Perft counts from the default position with the bottom player to move, keyed by (width, height).
+# counts[d - 1] is the number of move sequences of length d, where a sequence stops early if the game ends.
+# Any change to move generation or make_move that alters these is a rules change, not an optimization.
+PERFT_BASELINES = {
+    (4, 8): [17, 294, 5309, 99239, 2107244, 46017730],
+    (5, 6): [18, 335, 6322, 126002],
+    (3, 10): [12, 144, 1925, 26561],
+}
+
+
+def perft(board: MartianChessBoard, player: str, depth: int):
+    """Counts the leaf positions reached by playing every legal move sequence of the given depth"""
+    if depth == 0 or board.is_game_over():
+        return 1
+    options = board.get_player_options(player)
+    if depth == 1:
+        return len(options)
+    other = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+    nodes = 0
+    for option in options:
+        board.push_move(player, option[0], option[1], option[2], option[3])
+        nodes += perft(board, other, depth - 1)
+        board.pop_move()
+    return nodes
+
+
+def bench_perft(depth: int = 4, board_class: type = MartianChessBoard, width: int = 4, height: int = 8):
+    """Runs perft to every depth up to the given one, checking the counts against PERFT_BASELINES"""
+    board = board_class(width, height)
+    baselines = PERFT_BASELINES.get((width, height), [])
+    counts = []
+    start = time.perf_counter()
+    for d in range(1, depth + 1):
+        counts.append(perft(board, PlayerID.BOTTOM, d))
+    seconds = time.perf_counter() - start
+    checked = min(depth, len(baselines))
+    return {
+        "depth": depth,
+        "counts": counts,
+        "baseline_matches": counts[:checked] == baselines[:checked] if checked else None,
+        "seconds": seconds,
+        "nodes_per_sec": sum(counts) / seconds if seconds > 0 else 0.0,
+    }
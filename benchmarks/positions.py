@@ -0,0 +1,25 @@
+import random
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+
+
+def get_benchmark_positions(count: int = 8, seed: int = 0, plies_between: int = 6, width: int = 4, height: int = 8):
+    """Returns a fixed list of (board, player to move, points) positions taken from seeded random playouts.
+
+    Positions are recorded every plies_between moves, starting from the default position, so the same
+    seed always gives the same positions. Boards are lists of lists, indexed board[x][y]."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = MartianChessBoard(width, height)
+        player = PlayerID.BOTTOM
+        ply = 0
+        while not board.is_game_over() and len(positions) < count:
+            if ply % plies_between == 0:
+                positions.append(([list(column) for column in board.board], player, dict(board.points)))
+            option = rng.choice(board.get_player_options(player))
+            board.make_move(player, *option)
+            player = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+            ply += 1
+    return positions
@@ -0,0 +1,33 @@
+import random
+import time
+
+from benchmarks.positions import get_benchmark_positions
+from game.board import MartianChessBoard
+from game.snapshot import BoardSnapshot
+from players.depthsearch.player import DepthSearchPlayer
+
+
+def bench_depthsearch(max_depth: int = 3, alpha_beta: bool = False, board_class: type = MartianChessBoard, positions: int = 8, seed: int = 0):
+    """Times DepthSearchPlayer.make_move over the benchmark positions, returning nodes/sec and time per move"""
+    player = DepthSearchPlayer(max_depth=max_depth, alpha_beta=alpha_beta, board_class=board_class)
+    board = board_class()
+    nodes = 0
+    seconds = 0.0
+    random.seed(seed) # Plain depth search shuffles options before searching them
+    for pieces, player_id, points in get_benchmark_positions(positions, seed):
+        board.set_board(pieces)
+        options = board.get_player_options(player_id)
+        snapshot = BoardSnapshot.from_board(pieces)
+        start = time.perf_counter()
+        player.make_move(snapshot, options, player_id, points[player_id])
+        seconds += time.perf_counter() - start
+        nodes += player.nodes
+    return {
+        "max_depth": max_depth,
+        "alpha_beta": alpha_beta,
+        "positions": positions,
+        "nodes": nodes,
+        "seconds": seconds,
+        "nodes_per_sec": nodes / seconds if seconds > 0 else 0.0,
+        "seconds_per_move": seconds / positions,
+    }
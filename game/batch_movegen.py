@@ -0,0 +1,133 @@
+import numpy as np
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.movespace import get_move_space
+
+
+# Batch move generators are shared by everything in the process using the same board size, keyed by (width, height)
+_BATCH_MOVE_GENERATORS = {}
+
+# FIELD_PROMOTIONS[piece][target] is True where moving piece onto an owned target is a field promotion
+FIELD_PROMOTIONS = np.zeros((4, 4), dtype=bool)
+FIELD_PROMOTIONS[1, 1] = FIELD_PROMOTIONS[1, 2] = FIELD_PROMOTIONS[2, 1] = True
+
+
+def get_batch_move_generator(width, height):
+    """Returns the BatchMoveGenerator for a board of the given size, building its tables on first use"""
+    key = (width, height)
+    if key not in _BATCH_MOVE_GENERATORS:
+        _BATCH_MOVE_GENERATORS[key] = BatchMoveGenerator(width, height)
+    return _BATCH_MOVE_GENERATORS[key]
+
+
+def get_rejected_move(board: MartianChessBoard):
+    """Returns the (from_x, from_y, to_x, to_y) move the canal rejection rule forbids on a board, or (-1, -1, -1, -1)"""
+    last_move = board.last_move
+    if last_move.get("crosses") == True:
+        return (last_move["to_x"], last_move["to_y"], last_move["from_x"], last_move["from_y"])
+    return (-1, -1, -1, -1)
+
+
+class _PlayerMoveTables:
+    """Move space tables of one player, in board coordinates. Entry i describes the board move with move space index i"""
+    def __init__(self, width, height, moves, region):
+        squares = width * height
+        self.index = {move: i for i, move in enumerate(moves)}
+        self.from_squares = np.array([fx * height + fy for fx, fy, tx, ty in moves])
+        self.to_squares = np.array([tx * height + ty for fx, fy, tx, ty in moves])
+        self.from_owned = region[self.from_squares]
+        self.to_owned = region[self.to_squares]
+
+        # Which piece types can make each move, and the squares it passes over (padded with an always empty square)
+        self.piece_allowed = np.zeros((len(moves), 4), dtype=bool)
+        paths = []
+        for i, (fx, fy, tx, ty) in enumerate(moves):
+            dx, dy = tx - fx, ty - fy
+            distance = max(abs(dx), abs(dy))
+            step_x, step_y = np.sign(dx), np.sign(dy)
+            diagonal = abs(dx) == abs(dy)
+            self.piece_allowed[i, 1] = diagonal and distance == 1
+            self.piece_allowed[i, 2] = (dx == 0 or dy == 0) and distance <= 2
+            self.piece_allowed[i, 3] = diagonal or dx == 0 or dy == 0
+            paths.append([(fx + step_x * k) * height + fy + step_y * k for k in range(1, distance)])
+        longest = max((len(path) for path in paths), default=0)
+        self.paths = np.full((len(moves), max(longest, 1)), squares)
+        for i, path in enumerate(paths):
+            self.paths[i, :len(path)] = path
+
+
+class BatchMoveGenerator:
+    """Vectorized legal move generation for many positions at once, giving the same moves as MartianChessBoard.
+
+    Positions are (N, width, height) integer arrays of piece values indexed [n, x, y], like MartianChessBoard.board.
+    Legal moves are returned as (N, move space) boolean masks. Like NeuralnetPlayer and BatchedMartianChessEnv,
+    the bottom player's moves are indexed as if rotated 180 degrees to the top player's side. The move space
+    only holds moves starting in the top player's region, so on boards with an odd height the bottom player's
+    moves from the middle row have no index and are left out, as they are for the network."""
+    width: int
+    height: int
+
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.move_space = get_move_space(width, height)
+
+        # Regions each player controls, from the board's own ownership rule
+        board = MartianChessBoard(width, height, False)
+        regions = {
+            player: np.array([board.check_piece_ownership(player, x, y) for x in range(width) for y in range(height)])
+            for player in (PlayerID.TOP, PlayerID.BOTTOM)
+        }
+
+        # Board coordinate moves of each player, where the bottom player's are the move space rotated 180 degrees
+        w, h = width - 1, height - 1
+        rotated_moves = [(w - fx, h - fy, w - tx, h - ty) for fx, fy, tx, ty in self.move_space]
+        self.tables = {
+            PlayerID.TOP: _PlayerMoveTables(width, height, self.move_space.moves, regions[PlayerID.TOP]),
+            PlayerID.BOTTOM: _PlayerMoveTables(width, height, rotated_moves, regions[PlayerID.BOTTOM]),
+        }
+
+
+    def get_legal_masks(self, boards, top_to_move, rejected=None):
+        """Returns the (N, move space) boolean legal move mask of every position.
+
+        top_to_move is an (N,) boolean array, True where the top player is to move. rejected is an optional
+        (N, 4) array of the move the canal rejection rule forbids in each position, as (from_x, from_y, to_x, to_y)
+        in board coordinates, with rows of -1 where no move is forbidden (see get_rejected_move)."""
+        boards = np.asarray(boards)
+        top_to_move = np.asarray(top_to_move, dtype=bool)
+        count = len(boards)
+        flat = np.zeros((count, self.width * self.height + 1), dtype=np.int8) # Extra always empty square pads the paths
+        flat[:, :-1] = boards.reshape(count, -1)
+
+        masks = np.zeros((count, len(self.move_space)), dtype=bool)
+        for player, selected in ((PlayerID.TOP, top_to_move), (PlayerID.BOTTOM, ~top_to_move)):
+            rows = np.flatnonzero(selected)
+            if len(rows) == 0:
+                continue
+            tables = self.tables[player]
+            masks[rows] = self._get_player_masks(flat[rows], tables)
+
+            # Apply the canal rejection rule
+            if rejected is not None:
+                for row in rows:
+                    i = tables.index.get(tuple(int(value) for value in rejected[row]))
+                    if i is not None:
+                        masks[row, i] = False
+        return masks
+
+
+    def _get_player_masks(self, flat, tables):
+        """Legal move masks of padded flat boards that all have the same player to move"""
+        pieces = flat[:, tables.from_squares] # (N, M) piece making each move
+        targets = flat[:, tables.to_squares] # (N, M) piece on each move's target square
+
+        # The piece must be owned, able to make the move and have a clear path
+        legal = tables.from_owned & tables.piece_allowed[np.arange(len(tables.from_squares)), pieces]
+        legal &= ~(flat[:, tables.paths] != 0).any(axis=2)
+
+        # Targets must be empty, an enemy piece to take, or an owned piece to field promote with
+        target_ok = (targets == 0) | ~tables.to_owned | FIELD_PROMOTIONS[pieces, targets]
+        return legal & target_ok
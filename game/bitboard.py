@@ -0,0 +1,391 @@
+from game.board import MartianChessBoard, get_move_rays
+from game.snapshot import BoardSnapshot
+
+
+# Attack tables are shared by every board of the same size, keyed by (width, height)
+_ATTACK_TABLES = {}
+
+
+def get_attack_tables(width, height):
+    """Returns the precomputed attack tables for a board of the given size, building them on first use"""
+    key = (width, height)
+    if key not in _ATTACK_TABLES:
+        _ATTACK_TABLES[key] = BitboardAttackTables(width, height)
+    return _ATTACK_TABLES[key]
+
+
+class BitboardAttackTables:
+    """Per-square move tables for one board size, where squares are numbered x * height + y.
+
+    Attack sets are looked up by the occupancy of the squares that can block a piece, and option
+    lists by the resulting mask of legal targets. Both lookups are memoized on first use."""
+    width: int
+    height: int
+    relevant: list      # relevant[piece][sq] is the mask of squares whose occupancy changes the attack set
+    attacks: list       # attacks[piece][sq] maps relevant occupancy to the mask of reachable squares
+    rays: list          # rays[piece][sq] is the list of rays (lists of squares) that piece walks
+    options: list       # options[sq] maps a mask of legal targets to the tuple of option tuples
+    reach: list         # reach[piece][sq] is the mask of every square on the rays of that piece, ignoring blockers
+    piece_options: list # piece_options[piece][sq] maps the relevant occupancy and (shifted) reachable blocked squares to the piece's options
+    order: list         # order[sq] lists target squares in the order MartianChessBoard generates them
+    moves: list         # moves[from sq][to sq] is the prebuilt (from x, from y, to x, to y) option
+
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        squares = width * height
+        move_rays = get_move_rays(width, height)
+
+        # Every (from, to) pair maps to a prebuilt option tuple so move generation never allocates one
+        self.moves = [[(fsq // height, fsq % height, tsq // height, tsq % height) for tsq in range(squares)] for fsq in range(squares)]
+
+        self.relevant = [None] + [[0] * squares for _ in range(3)]
+        self.attacks = [None] + [[{} for _ in range(squares)] for _ in range(3)]
+        self.rays = [None] + [[None] * squares for _ in range(3)]
+        self.options = [{} for _ in range(squares)]
+        self.reach = [None] + [[0] * squares for _ in range(3)]
+        self.piece_options = [None] + [[{} for _ in range(squares)] for _ in range(3)]
+        self.order = [None] * squares
+        for sq in range(squares):
+            x, y = divmod(sq, height)
+            for piece in range(1, 4):
+                rays = [[cx * height + cy for cx, cy in ray] for ray in move_rays[piece][x][y]]
+                self.rays[piece][sq] = rays
+                # The last square of a ray is reachable whether or not it is occupied, so it never matters
+                for ray in rays:
+                    for tsq in ray[:-1]:
+                        self.relevant[piece][sq] |= 1 << tsq
+                    for tsq in ray:
+                        self.reach[piece][sq] |= 1 << tsq
+            # Queen rays cover every other piece's targets in the same relative order
+            self.order[sq] = [tsq for ray in self.rays[3][sq] for tsq in ray]
+
+
+    def get_attack(self, piece, sq, occupied):
+        """Returns the mask of squares the piece on sq reaches, stopping on (and including) the first blocker"""
+        key = occupied & self.relevant[piece][sq]
+        attack = self.attacks[piece][sq].get(key)
+        if attack is None:
+            attack = 0
+            for ray in self.rays[piece][sq]:
+                for tsq in ray:
+                    attack |= 1 << tsq
+                    if key >> tsq & 1:
+                        break
+            self.attacks[piece][sq][key] = attack
+        return attack
+
+
+    def get_piece_options(self, piece, sq, occupied, blocked):
+        """Returns the options of a piece on sq given the occupied squares and the targets its owner may not land on,
+        memoized under the only squares of both that can change them"""
+        key = occupied & self.relevant[piece][sq] | (blocked & self.reach[piece][sq]) << self.width * self.height
+        options = self.piece_options[piece][sq].get(key)
+        if options is None:
+            options = self.get_options(sq, self.get_attack(piece, sq, occupied) & ~blocked)
+            self.piece_options[piece][sq][key] = options
+        return options
+
+
+    def get_options(self, sq, legal):
+        """Returns the tuple of options moving the piece on sq to each square of the legal mask"""
+        options = self.options[sq].get(legal)
+        if options is None:
+            options = tuple(self.moves[sq][tsq] for tsq in self.order[sq] if legal >> tsq & 1)
+            self.options[sq][legal] = options
+        return options
+
+
+class BitboardMartianChessBoard(MartianChessBoard):
+    """Drop-in MartianChessBoard backend that stores each piece type as an integer bitmask (bit x * height + y)"""
+    pawns: int      # Bitmask of squares holding a pawn
+    drones: int     # Bitmask of squares holding a drone
+    queens: int     # Bitmask of squares holding a queen
+    region_masks: dict  # Maps playerID to a bitmask of the squares that player controls
+    tables: BitboardAttackTables # Shared move tables for this board size
+
+
+    def __init__(
+        self,
+        width: int | None = 4,
+        height: int | None = 8,
+        default_setup: bool | None = True,
+        custom_players: list | None = None
+    ):
+        self.pawns = self.drones = self.queens = 0
+        self.tables = get_attack_tables(width, height)
+        super().__init__(width, height, default_setup, custom_players)
+
+        # Precompute which squares each player controls
+        self.region_masks = {}
+        for player in self.players:
+            focus_x1, focus_y1, focus_x2, focus_y2 = self.get_focus_area(player)
+            mask = 0
+            for x in range(focus_x1, focus_x2 + 1):
+                for y in range(focus_y1, focus_y2 + 1):
+                    mask |= 1 << (x * height + y)
+            self.region_masks[player] = mask
+
+
+    @property
+    def board(self):
+        """List of lists view of the bitboards, matching MartianChessBoard.board"""
+        return [[self.get_space(x, y) for y in range(self.height)] for x in range(self.width)]
+
+    @board.setter
+    def board(self, board):
+        self.pawns = self.drones = self.queens = 0
+        self.board_hash = 0
+        for x, column in enumerate(board):
+            for y, piece in enumerate(column):
+                self.place(piece, x, y)
+
+
+    def place(self, piece, x, y):
+        """Places the given piece at the requested XY coordinates. (0=none, 1=pawn, 2=drone, 3=queen)"""
+        sq = x * self.height + y
+        bit = 1 << sq
+        keys = self.zobrist.pieces[sq]
+        self.board_hash ^= keys[self._piece_at(bit)] ^ keys[piece]
+        self.pawns &= ~bit
+        self.drones &= ~bit
+        self.queens &= ~bit
+        if piece == 1:
+            self.pawns |= bit
+        elif piece == 2:
+            self.drones |= bit
+        elif piece == 3:
+            self.queens |= bit
+
+
+    def set_board(self, board):
+        """Replaces the board state with a copy of the given board (indexable as board[x][y])"""
+        self.board = board
+        self.move_stack = []
+
+
+    def get_snapshot(self):
+        """Returns a cheap read-only copy of the board state, indexable as board[x][y]"""
+        data = bytearray(self.width * self.height)
+        for mask, piece in ((self.pawns, 1), (self.drones, 2), (self.queens, 3)):
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                data[bit.bit_length() - 1] = piece
+        return BoardSnapshot(self.width, self.height, bytes(data))
+
+
+    def get_space(self, x, y):
+        """Gets the value of a specific space of the board, returns -1 if out of bounds."""
+        if not (x >= 0 and y >= 0 and x < self.width and y < self.height):
+            return -1
+        return self._piece_at(1 << (x * self.height + y))
+
+
+    def _piece_at(self, bit):
+        """Returns the piece type occupying the square of the given bit"""
+        if self.pawns & bit:
+            return 1
+        if self.drones & bit:
+            return 2
+        if self.queens & bit:
+            return 3
+        return 0
+
+
+    def get_controlled_pieces(self, player: str):
+        """Returns a list of pieces that this player has control over in the format (piece type, x, y)"""
+        pieces = []
+        remaining = (self.pawns | self.drones | self.queens) & self.region_masks[player]
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            x, y = divmod(bit.bit_length() - 1, self.height)
+            pieces.append((self._piece_at(bit), x, y))
+        return pieces
+
+
+    def count_controlled_pieces(self, player: str):
+        """Returns the number of pieces that this player has control over"""
+        return ((self.pawns | self.drones | self.queens) & self.region_masks[player]).bit_count()
+
+
+    def is_game_over(self):
+        """Scans the board state and determines if the game is over, if so, returns playerID of winner"""
+        occupied = self.pawns | self.drones | self.queens
+        for mask in self.region_masks.values():
+            if not occupied & mask:
+                return self.get_winner() # Let the shared rules pick the winner
+        return False
+
+
+    def _get_rejected_move(self):
+        """Returns the option that the canal rejection rule forbids, or None"""
+        last_move = self.last_move
+        if last_move.get("crosses") == True:
+            return (last_move["to_x"], last_move["to_y"], last_move["from_x"], last_move["from_y"])
+        return None
+
+
+    def _get_blocked(self, own):
+        """Returns the blocked target masks for pawns, drones and queens of the player controlling own"""
+        # Pawns may not land on their own queens, pawn + pawn and pawn + drone are field promotions.
+        # Drones may only land on their own pawns (promotion to queen). Queens can never field promote.
+        return (None, own & self.queens, own & (self.drones | self.queens), own & (self.pawns | self.drones | self.queens))
+
+
+    def _get_square_options(self, sq, own):
+        """Returns the options of the piece on sq, given the squares its owner controls"""
+        piece = self._piece_at(1 << sq)
+        if not piece:
+            return ()
+        attack = self.tables.get_attack(piece, sq, self.pawns | self.drones | self.queens)
+        return self.tables.get_options(sq, attack & ~self._get_blocked(own)[piece])
+
+
+    def get_piece_options(self, player, piece_type, x, y):
+        """Determines what options a piece has based on it's type, location and owner player"""
+        rejected = self._get_rejected_move()
+        options = self._get_square_options(x * self.height + y, self.region_masks[player])
+        return [(option[2], option[3]) for option in options if option != rejected]
+
+
+    def get_player_options(self, player: str):
+        """Returns all of the options that a player has in a list of tuples formatted as (piece x, piece y, to x, to y)"""
+        # This is the hottest loop in search, so each piece's options come from a single lookup of its
+        # blocking squares (see BitboardAttackTables.get_piece_options) and the blocked masks are inlined
+        pawns, drones, queens = self.pawns, self.drones, self.queens
+        occupied = pawns | drones | queens
+        own = self.region_masks[player]
+        mine = occupied & own
+        # Pawns may not land on their own queens, pawn + pawn and pawn + drone are field promotions.
+        # Drones may only land on their own pawns (promotion to queen). Queens can never field promote.
+        pawn_blocked = own & queens
+        drone_blocked = own & (drones | queens)
+        tables = self.tables
+        relevant, reach, piece_options = tables.relevant, tables.reach, tables.piece_options
+        shift = tables.width * tables.height
+
+        options = []
+        extend = options.extend
+        remaining = mine
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            sq = bit.bit_length() - 1
+            if pawns & bit:
+                piece, blocked = 1, pawn_blocked
+            elif drones & bit:
+                piece, blocked = 2, drone_blocked
+            else:
+                piece, blocked = 3, mine
+            square_options = piece_options[piece][sq].get(occupied & relevant[piece][sq] | (blocked & reach[piece][sq]) << shift)
+            if square_options is None:
+                square_options = tables.get_piece_options(piece, sq, occupied, blocked)
+            extend(square_options)
+
+        # Apply the canal rejection rule
+        last_move = self.last_move
+        if last_move.get("crosses"):
+            rejected = (last_move["to_x"], last_move["to_y"], last_move["from_x"], last_move["from_y"])
+            if rejected in options:
+                options.remove(rejected)
+        return options
+
+
+    def make_move(self, player, piece_x, piece_y, to_x, to_y):
+        """Attempts to move the given piece"""
+        # Inlined like get_player_options, since search and self-play make a move for every position they visit
+        height = self.height
+        width = self.width
+        if not (0 <= piece_x < width and 0 <= piece_y < height and 0 <= to_x < width and 0 <= to_y < height):
+            return False
+        from_sq = piece_x * height + piece_y
+        to_sq = to_x * height + to_y
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        own = self.region_masks[player]
+        pawns, drones, queens = self.pawns, self.drones, self.queens
+        occupied = pawns | drones | queens
+
+        # Check if move is legal
+        if not own & occupied & from_bit:
+            return False
+        if pawns & from_bit:
+            piece_type, blocked = 1, own & queens
+        elif drones & from_bit:
+            piece_type, blocked = 2, own & (drones | queens)
+        else:
+            piece_type, blocked = 3, own & occupied
+        tables = self.tables
+        attack = tables.attacks[piece_type][from_sq].get(occupied & tables.relevant[piece_type][from_sq])
+        if attack is None:
+            attack = tables.get_attack(piece_type, from_sq, occupied)
+        if not attack & to_bit & ~blocked:
+            return False
+        last_move = self.last_move
+        if last_move.get("crosses") and last_move["to_x"] == piece_x and last_move["to_y"] == piece_y and last_move["from_x"] == to_x and last_move["from_y"] == to_y:
+            return False
+
+        # Perform move action
+        if not occupied & to_bit:
+            # Move to empty space
+            target_type = 0
+            result_type = piece_type
+        else:
+            target_type = 1 if pawns & to_bit else (2 if drones & to_bit else 3)
+            if not own & to_bit:
+                # Take enemy piece
+                self.points[player] += target_type # Score points
+                result_type = piece_type
+            else:
+                # Field promote (pawn + pawn = drone, pawn + drone = queen)
+                result_type = piece_type + target_type
+
+        keys = self.zobrist.pieces
+        self.board_hash ^= keys[from_sq][piece_type] ^ keys[to_sq][target_type] ^ keys[to_sq][result_type]
+        clear = ~(from_bit | to_bit)
+        pawns &= clear
+        drones &= clear
+        queens &= clear
+        if result_type == 1:
+            pawns |= to_bit
+        elif result_type == 2:
+            drones |= to_bit
+        else:
+            queens |= to_bit
+        self.pawns, self.drones, self.queens = pawns, drones, queens
+
+        # Update last move
+        self.last_move = {"player": player, "from_x": piece_x, "from_y": piece_y, "to_x": to_x, "to_y": to_y, "crosses": not own & to_bit}
+        return True
+
+
+    def reset_board(self):
+        """Resets the board back to its original state"""
+        self.pawns = self.drones = self.queens = 0
+        self.board_hash = 0
+        if self.default_pieces:
+            self._place_default_pieces()
+
+        # Reset game variables
+        for player in self.players:
+            self.points[player] = 0
+        self.last_move = {}
+        self.move_stack = []
+
+
+    def push_move(self, player, piece_x, piece_y, to_x, to_y):
+        """Makes a move in place like make_move, remembering how to take it back with pop_move"""
+        undo = (player, self.pawns, self.drones, self.queens, self.board_hash, self.points[player], self.last_move)
+        if not self.make_move(player, piece_x, piece_y, to_x, to_y):
+            return False
+        self.move_stack.append(undo)
+        return True
+
+
+    def pop_move(self):
+        """Takes back the last move made with push_move, restoring the pieces, points and last move"""
+        player, self.pawns, self.drones, self.queens, self.board_hash, points, self.last_move = self.move_stack.pop()
+        self.points[player] = points
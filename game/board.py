@@ -1,4 +1,48 @@
 from game.enum import PlayerID
+from game.snapshot import BoardSnapshot
+from game.zobrist import get_zobrist_keys
+
+
+# Move rays are shared by every board of the same size, keyed by (width, height)
+_MOVE_RAYS = {}
+
+# Square regions are shared by every board of the same size and players, keyed by (width, height, players)
+_SQUARE_REGIONS = {}
+
+
+def get_move_rays(width, height):
+    """Returns rays[piece type][x][y], the tuple of rays of (x, y) squares that piece walks from x,y, building them on first use"""
+    key = (width, height)
+    if key not in _MOVE_RAYS:
+        _MOVE_RAYS[key] = _build_move_rays(width, height)
+    return _MOVE_RAYS[key]
+
+
+def _build_move_rays(width, height):
+    """Walks every direction of every piece type from every square of the board"""
+    piece_moves = [
+        ([], 0),                                                                        # Empty
+        ([(-1, -1), (-1, 1), (1, -1), (1, 1)], 1),                                      # Pawn
+        ([(1, 0), (-1, 0), (0, 1), (0, -1)], 2),                                        # Drone
+        ([(1, 0), (-1, 0), (0, 1), (0, -1), (-1, -1), (-1, 1), (1, -1), (1, 1)], max(width, height)), # Queen
+    ]
+    rays = []
+    for directions, max_length in piece_moves:
+        piece_rays = [[None] * height for x in range(width)]
+        for x in range(width):
+            for y in range(height):
+                square_rays = []
+                for dir in directions:
+                    ray = []
+                    cx, cy = x + dir[0], y + dir[1]
+                    while 0 <= cx < width and 0 <= cy < height and len(ray) < max_length:
+                        ray.append((cx, cy))
+                        cx, cy = cx + dir[0], cy + dir[1]
+                    if ray:
+                        square_rays.append(tuple(ray))
+                piece_rays[x][y] = tuple(square_rays)
+        rays.append(piece_rays)
+    return rays
 
 
 class MartianChessBoard:
@@ -8,6 +52,9 @@ class MartianChessBoard:
     players: list   # List of players who are playing on this board
     points: dict    # Maps playerID to number of points
     last_move: dict # Stores the last move made (player, from_x, from_y, to_x, to_y, crosses)
+    move_stack: list # Undo information for moves made with push_move
+    board_hash: int # Zobrist hash of the pieces on the board, updated by place
+    region_pieces: dict # Maps playerID to a bitmask (bit x * height + y) of the occupied squares that player controls, updated by place
 
 
     def __init__(
@@ -22,20 +69,64 @@ class MartianChessBoard:
         self.height = height
         self.last_move = {}
         self.points = {}
+        self.move_stack = []
+        self.zobrist = get_zobrist_keys(width, height)
+        self.rays = get_move_rays(width, height)
+        self.board_hash = 0
 
         # Add players
         self.players = [PlayerID.TOP, PlayerID.BOTTOM]  # Default players
         if custom_players:
             self.players = custom_players
+        self.square_regions = self._get_square_regions()
 
         # Initialize board
         self.default_pieces = default_setup
         self.reset_board()
 
 
+    def _get_square_regions(self):
+        """Returns square_regions[x][y], the tuple of players whose focus area contains x,y"""
+        key = (self.width, self.height, tuple(self.players))
+        if key not in _SQUARE_REGIONS:
+            _SQUARE_REGIONS[key] = [
+                [tuple(player for player in self.players if self.check_piece_ownership(player, x, y)) for y in range(self.height)]
+                for x in range(self.width)
+            ]
+        return _SQUARE_REGIONS[key]
+
+
     def place(self, piece, x, y):
         """Places the given piece at the requested XY coordinates. (0=none, 1=pawn, 2=drone, 3=queen)"""
+        keys = self.zobrist.pieces[x * self.height + y]
+        old_piece = self.board[x][y]
+        self.board_hash ^= keys[old_piece] ^ keys[piece]
         self.board[x][y] = piece
+        if (old_piece == 0) != (piece == 0): # The square was emptied or filled, so flip it in the region piece sets
+            bit = 1 << (x * self.height + y)
+            for player in self.square_regions[x][y]:
+                self.region_pieces[player] ^= bit
+
+
+    def set_board(self, board):
+        """Replaces the board state with a copy of the given board (indexable as board[x][y])"""
+        self.board = [[0 for y in range(self.height)] for x in range(self.width)]
+        self.board_hash = 0
+        self.region_pieces = {player: 0 for player in self.players}
+        for x, column in enumerate(board):
+            for y, piece in enumerate(column):
+                self.place(piece, x, y)
+        self.move_stack = []
+
+
+    def get_snapshot(self):
+        """Returns a cheap read-only copy of the board state, indexable as board[x][y]"""
+        return BoardSnapshot(self.width, self.height, b"".join(map(bytes, self.board)))
+
+
+    def get_hash(self):
+        """Returns the Zobrist hash of the position, covering the board, the side to move and canal rejection"""
+        return self.board_hash ^ self.zobrist.get_last_move_key(self.last_move)
     
 
     def get_space(self, x, y):
@@ -59,16 +150,21 @@ class MartianChessBoard:
 
     def get_controlled_pieces(self, player: str):
         """Returns a list of pieces that this player has control over in the format (piece type, x, y)"""
-        focus_x1, focus_y1, focus_x2, focus_y2 = self.get_focus_area(player)
-        # Find pieces within this focus
+        # Walk the occupied squares of this player's region in bit order, which is the same x then y order as a scan
         pieces = []
-        for x in range(focus_x1, focus_x2 + 1):
-            for y in range(focus_y1, focus_y2 + 1):
-                piece = self.get_space(x, y)
-                # Only add if it's not empty
-                if piece > 0:
-                    pieces.append((piece, x, y))
+        board = self.board
+        remaining = self.region_pieces[player]
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            x, y = divmod(bit.bit_length() - 1, self.height)
+            pieces.append((board[x][y], x, y))
         return pieces
+
+
+    def count_controlled_pieces(self, player: str):
+        """Returns the number of pieces that this player has control over"""
+        return self.region_pieces[player].bit_count()
     
 
     def check_piece_ownership(self, player, x, y):
@@ -92,57 +188,28 @@ class MartianChessBoard:
     def get_piece_options(self, player, piece_type, x, y):
         """Determines what options a piece has based on it's type, location and owner player"""
         options = []
-        moves = []
-
-        # Determine possible moves
-        if piece_type == 1:
-            # Pawn
-            direct_moves = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-            for move in direct_moves:
-                moves.append((x + move[0], y + move[1]))
-        elif piece_type == 2:
-            # Drone
-            directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-            for dir in directions:
-                cx, cy = x, y
-                for i in range(2):
-                    cx = cx + dir[0]
-                    cy = cy + dir[1]
-                    if self.get_space(cx, cy) < 0: # If out of bounds, stop now
-                        break
-                    moves.append((cx, cy))
-                    if self.get_space(cx, cy) > 0: # If there's a piece here, stop after adding to moves
-                        break
-        elif piece_type == 3:
-            # Queen
-            directions = [(1, 0), (-1, 0), (0, 1), (0, -1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-            for dir in directions:
-                cx, cy = x, y
-                while True:
-                    cx = cx + dir[0]
-                    cy = cy + dir[1]
-                    if self.get_space(cx, cy) < 0: # If out of bounds, stop now
-                        break
-                    moves.append((cx, cy))
-                    if self.get_space(cx, cy) > 0: # If there's a piece here, stop after adding to moves
-                        break
-
-        # Enumerate possible moves
-        for move in moves:
-            cx, cy = move[0], move[1]
-
-            if self.last_move.get("crosses") == True: # Check for move rejection
-                if self.last_move["to_x"] == x and self.last_move["to_y"] == y and self.last_move["from_x"] == cx and self.last_move["from_y"] == cy:
-                    continue # Exclude illegal move
-
-            if self.get_space(cx, cy) == 0: # Is it an empty space?
-                options.append((cx, cy))
-
-            elif self.can_player_take(player, cx, cy): # Can we take enemy piece?
-                options.append((cx, cy))
-
-            elif self.can_field_promote(player, x, y, cx, cy): # Can we do a field promotion?
-                options.append((cx, cy))
+        board = self.board
+
+        # Find the square this piece may not return to because of move rejection
+        rejected = None
+        if self.last_move.get("crosses") == True and self.last_move["to_x"] == x and self.last_move["to_y"] == y:
+            rejected = (self.last_move["from_x"], self.last_move["from_y"])
+
+        # Walk the precomputed rays, stopping at the first piece in the way
+        focus_x1, focus_y1, focus_x2, focus_y2 = self.get_focus_area(player)
+        for ray in self.rays[piece_type][x][y]:
+            for cx, cy in ray:
+                if board[cx][cy] == 0: # Is it an empty space?
+                    if (cx, cy) != rejected:
+                        options.append((cx, cy))
+                    continue
+
+                if (cx, cy) != rejected:
+                    if not (focus_x1 <= cx <= focus_x2 and focus_y1 <= cy <= focus_y2): # Can we take enemy piece?
+                        options.append((cx, cy))
+                    elif self.can_field_promote(player, x, y, cx, cy): # Can we do a field promotion?
+                        options.append((cx, cy))
+                break # There's a piece here, stop after considering it
 
         return options
 
@@ -186,14 +253,14 @@ class MartianChessBoard:
 
     def is_game_over(self):
         """Scans the board state and determines if the game is over, if so, returns playerID of winner"""
-        game_over = False
         for player in self.players:
-            pieces = self.get_controlled_pieces(player)
-            if len(pieces) == 0:
-                game_over = True # Game is over
-        if not game_over:
-            return False # Let the game go on.
-        
+            if not self.region_pieces[player]:
+                return self.get_winner() # Game is over
+        return False # Let the game go on.
+
+
+    def get_winner(self):
+        """Returns the playerID of the winner of a finished game, based on points and the tie breaker"""
         # Figure out who won
         max_points = max(self.points.values()) # Calculate max points a player has
         winners = []
@@ -217,6 +284,8 @@ class MartianChessBoard:
         """Resets the board back to its original state"""
         # Set default board state
         self.board = [[0 for y in range(self.height)] for x in range(self.width)]
+        self.board_hash = 0
+        self.region_pieces = {player: 0 for player in self.players}
         if self.default_pieces:
             self._place_default_pieces()
 
@@ -224,12 +293,15 @@ class MartianChessBoard:
         for player in self.players:
             self.points[player] = 0
         self.last_move = {}
+        self.move_stack = []
 
 
     def make_move(self, player, piece_x, piece_y, to_x, to_y):
         """Attempts to move the given piece"""
         # Check if move is legal
         piece_type = self.get_space(piece_x,piece_y)
+        if piece_type <= 0: # Out of bounds or empty, there is no piece to move
+            return False
         options = self.get_piece_options(player, piece_type, piece_x, piece_y)
         if (to_x, to_y) not in options:
             # Invalid move
@@ -256,4 +328,22 @@ class MartianChessBoard:
         # Update last move
         crosses_canal = not self.check_piece_ownership(player, to_x, to_y)
         self.last_move = {"player": player, "from_x": piece_x, "from_y": piece_y, "to_x": to_x, "to_y": to_y, "crosses": crosses_canal}
-        return True
\ No newline at end of file
+        return True
+
+
+    def push_move(self, player, piece_x, piece_y, to_x, to_y):
+        """Makes a move in place like make_move, remembering how to take it back with pop_move"""
+        undo = (player, piece_x, piece_y, to_x, to_y, self.get_space(piece_x, piece_y), self.get_space(to_x, to_y), self.points[player], self.last_move)
+        if not self.make_move(player, piece_x, piece_y, to_x, to_y):
+            return False
+        self.move_stack.append(undo)
+        return True
+
+
+    def pop_move(self):
+        """Takes back the last move made with push_move, restoring the pieces, points and last move"""
+        player, piece_x, piece_y, to_x, to_y, piece, target, points, last_move = self.move_stack.pop()
+        self.place(piece, piece_x, piece_y)
+        self.place(target, to_x, to_y)
+        self.points[player] = points
+        self.last_move = last_move
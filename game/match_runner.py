@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import random
+import sys
+
+from game.enum import PlayerID
+
+
+# Per-worker state, created once by _init_worker in every pool process
+_worker = {}
+
+
+def _init_worker(top_factory, bottom_factory, referee_kwargs, seed, fresh_players):
+    """Builds this worker's referee and players once. Unless fresh_players is set, the players are reused for every game it plays"""
+    from game.referee import MartianChessReferee
+    _worker["referee"] = MartianChessReferee(top_factory(), bottom_factory(), display_board=False, **referee_kwargs)
+    _worker["factories"] = (top_factory, bottom_factory) if fresh_players else None
+    _worker["seed"] = seed
+
+
+def _seed_game(seed):
+    """Seeds every random number generator a player might use. A game is reproducible from its seed as long as
+    its players start it in the same state, which only holds for stateless players unless fresh_players is set"""
+    random.seed(seed)
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed(seed % 2**32)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+
+def _play_game(game_index):
+    """Plays one game in a worker and returns (game index, winner, score, move count)"""
+    _seed_game(_worker["seed"] + game_index)
+    referee = _worker["referee"]
+    if _worker["factories"]:
+        # Players may keep state between games (transposition tables, search pools, learning),
+        # which would make a game depend on the games its worker happened to play before it
+        top_factory, bottom_factory = _worker["factories"]
+        referee.top_player = top_factory()
+        referee.bottom_player = bottom_factory()
+    winner, score = referee.play_round()
+    return game_index, winner, score, referee.move_count
+
+
+class MatchSummary:
+    """Running totals of match results, updated one game at a time"""
+    games: int          # Number of games played
+    top_wins: int       # Games won by the top player
+    bottom_wins: int    # Games won by the bottom player
+    draws: int          # Games that hit the move limit
+    total_score: int    # Sum of final scores (top points - bottom points)
+    total_moves: int    # Sum of moves made
+
+
+    def __init__(self):
+        self.games = self.top_wins = self.bottom_wins = self.draws = 0
+        self.total_score = self.total_moves = 0
+
+
+    def add(self, winner, score, move_count):
+        """Adds the result of one game"""
+        self.games += 1
+        if winner == PlayerID.TOP:
+            self.top_wins += 1
+        elif winner == PlayerID.BOTTOM:
+            self.bottom_wins += 1
+        else:
+            self.draws += 1
+        self.total_score += score
+        self.total_moves += move_count
+
+
+    def to_dict(self):
+        """Returns the totals along with win rates and averages"""
+        games = max(self.games, 1)
+        return {
+            "games": self.games,
+            "top_wins": self.top_wins,
+            "bottom_wins": self.bottom_wins,
+            "draws": self.draws,
+            "top_win_rate": self.top_wins / games,
+            "bottom_win_rate": self.bottom_wins / games,
+            "draw_rate": self.draws / games,
+            "average_score": self.total_score / games,
+            "average_moves": self.total_moves / games,
+        }
+
+
+class MatchRunner:
+    """Plays many MartianChessReferee games across a pool of worker processes.
+
+    Players are given as zero argument factories (a player class, or a functools.partial of one) so that
+    each worker builds its own players. Factories must be picklable, so lambdas will not work. Workers are
+    daemonic processes and cannot start processes of their own, so a DepthSearchPlayer with processes set
+    searches in its worker instead.
+
+    Game i is seeded with seed + i, but by default each worker reuses its players for every game it plays,
+    so a game only has the same result from run to run for stateless players (such as RandomPlayer). Set
+    fresh_players to build new players for every game, making each result depend on its seed alone."""
+    def __init__(
+        self,
+        top_factory,                        # Creates the top player in each worker
+        bottom_factory,                     # Creates the bottom player in each worker
+        processes: int | None = None,       # Number of worker processes, defaults to every core
+        seed: int = 0,                      # Game i is played with random seed (seed + i)
+        chunk_size: int = 16,               # Games handed to a worker at once
+        fresh_players: bool = False,        # Build new players for every game instead of once per worker, for reproducible results
+        **referee_kwargs,                   # Extra arguments for MartianChessReferee, such as move_limit
+    ):
+        self.top_factory = top_factory
+        self.bottom_factory = bottom_factory
+        self.processes = processes or os.cpu_count()
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.fresh_players = fresh_players
+        self.referee_kwargs = referee_kwargs
+
+
+    def play(self, games: int):
+        """Plays the given number of games, yielding (game index, winner, score, move count) as each one finishes"""
+        with multiprocessing.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(self.top_factory, self.bottom_factory, self.referee_kwargs, self.seed, self.fresh_players),
+        ) as pool:
+            yield from pool.imap_unordered(_play_game, range(games), chunksize=self.chunk_size)
+
+
+    def run(self, games: int, progress_every: int = 0):
+        """Plays the given number of games and returns a MatchSummary, optionally printing progress"""
+        summary = MatchSummary()
+        for game_index, winner, score, move_count in self.play(games):
+            summary.add(winner, score, move_count)
+            if progress_every and summary.games % progress_every == 0:
+                stats = summary.to_dict()
+                print(f"Games: {summary.games} | T Wins: {int(stats['top_win_rate'] * 100)}% | B Wins: {int(stats['bottom_win_rate'] * 100)}% | Draws: {int(stats['draw_rate'] * 100)}%")
+        return summary
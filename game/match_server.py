@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import itertools
+import json
+import shlex
+import sys
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.match_runner import MatchSummary
+
+
+# Messages are single lines of JSON. Players open with {"type": "hello", "name": ..., "version": PROTOCOL_VERSION}, then the server sends
+#   {"type": "move", "game": id, "width": w, "height": h, "board": "0120...", "options": [[x, y, to x, to y], ...], "player": id, "score": n, "timeout": seconds}
+#   {"type": "game_over", "game": id, "winner": bool, "score": n}
+#   {"type": "close"}
+# and players answer every move request with {"type": "move", "game": id, "move": option index}.
+# The board is one digit per square in column major order, like BoardSnapshot.data.
+PROTOCOL_VERSION = 1
+
+
+def encode_message(message: dict):
+    """Encodes a message as one line of JSON"""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_message(line: bytes):
+    """Decodes a line of JSON into a message"""
+    return json.loads(line)
+
+
+class PlayerConnection:
+    """An out-of-process player, reached over a pipe or a socket. One connection can play many games at once,
+    since every request carries a game id and replies are matched to waiting requests by it.
+
+    Players answer requests one at a time, so only one request is sent at a time and the others wait their
+    turn here. Each move deadline starts when its request is sent, not while it waits behind other games."""
+    name: str           # Name the player gave in its hello message
+    pending: dict       # Futures of unanswered move requests, keyed by game id
+
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter | None, name: str, process=None):
+        self.reader = reader
+        self.writer = writer
+        self.name = name
+        self.process = process # The player's process, if it was started by spawn
+        self.pending = {}
+        self.closed = False
+        self.idle = asyncio.Lock() # Held while the player works on a request, including one that already timed out
+        self.read_task = asyncio.create_task(self._read_replies())
+
+
+    @classmethod
+    async def spawn(cls, command: list):
+        """Starts a player process (such as game.player_host) and talks to it over its stdin and stdout"""
+        process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        hello = await cls._read_hello(process.stdout)
+        return cls(process.stdout, process.stdin, hello.get("name", command[-1]), process)
+
+
+    @classmethod
+    async def accept(cls, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Wraps a socket connection made by a player, once it has said hello"""
+        hello = await cls._read_hello(reader)
+        return cls(reader, writer, hello.get("name", "player"))
+
+
+    @staticmethod
+    async def _read_hello(reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Player closed the connection before saying hello")
+        hello = decode_message(line)
+        if hello.get("type") != "hello" or hello.get("version") != PROTOCOL_VERSION:
+            raise ConnectionError(f"Unexpected hello from player: {hello}")
+        return hello
+
+
+    async def _read_replies(self):
+        """Resolves pending requests as replies arrive, including late replies to timed out requests, which only free the player"""
+        try:
+            while line := await self.reader.readline():
+                message = decode_message(line)
+                future = self.pending.pop(message.get("game"), None)
+                if future and not future.done():
+                    future.set_result(message.get("move"))
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Player {self.name} disconnected"))
+            self.pending.clear()
+
+
+    async def send(self, message: dict):
+        """Sends a message to the player and waits for it to be flushed, ignoring players that already went away"""
+        if self.closed:
+            return
+        try:
+            self.writer.write(encode_message(message))
+            await self.writer.drain() # Applies backpressure, instead of buffering without limit for a player that reads slowly
+        except ConnectionError:
+            pass
+
+
+    async def request_move(self, game_id: int, board, options: list, player: str, score: int, timeout: float | None):
+        """Asks for a move once the player is idle and returns the reply, raising asyncio.TimeoutError if it takes longer than timeout"""
+        await self.idle.acquire()
+        if self.closed:
+            self.idle.release()
+            raise ConnectionError(f"Player {self.name} disconnected")
+        future = asyncio.get_running_loop().create_future()
+        self.pending[game_id] = future
+        message = {
+            "type": "move",
+            "game": game_id,
+            "width": board.width,
+            "height": board.height,
+            "board": "".join(map(str, board.data)),
+            "options": options,
+            "player": player,
+            "score": score,
+            "timeout": timeout,
+        }
+        try:
+            await asyncio.wait_for(self.send(message), timeout)
+        except asyncio.TimeoutError:
+            # The player is not even reading its requests, so it is hung
+            print(f"Warning: Player {self.name} stopped reading requests, disconnecting it")
+            self.abort()
+            self.pending.pop(game_id, None)
+            self.idle.release()
+            raise
+        except BaseException:
+            self.pending.pop(game_id, None)
+            self.idle.release()
+            raise
+        try:
+            move = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            # The player is still working on this move, so it stays busy until it answers
+            asyncio.create_task(self._wait_for_late_reply(game_id, future, timeout))
+            raise
+        except BaseException:
+            self.pending.pop(game_id, None)
+            self.idle.release()
+            raise
+        self.idle.release()
+        return move
+
+
+    async def _wait_for_late_reply(self, game_id, future, timeout):
+        """Frees the player once it answers a timed out request. A player that takes another timeout is treated as hung and dropped,
+        so the games waiting for it forfeit instead of waiting forever"""
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: Player {self.name} stopped answering, disconnecting it")
+            self.abort()
+        except ConnectionError:
+            pass
+        finally:
+            self.pending.pop(game_id, None)
+            self.idle.release()
+
+
+    def abort(self):
+        """Drops the connection without waiting for the player, failing its pending requests"""
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+        if self.writer:
+            self.writer.close()
+        self.read_task.cancel()
+
+
+    async def close(self):
+        """Tells the player to stop and waits for its process, if we started it"""
+        await self.send({"type": "close"})
+        if not self.closed:
+            self.writer.close()
+        if self.process:
+            await self.process.wait()
+        await asyncio.gather(self.read_task, return_exceptions=True)
+
+
+class MatchServer:
+    """Referee that plays many games concurrently against out-of-process players, on one asyncio event loop.
+
+    Follows the rules of MartianChessReferee.play_round, and additionally forfeits a player that does not
+    answer within move_timeout seconds or disconnects, the same way it forfeits out of range moves. Games
+    on the same connection queue for it, so max_games can be far above the number of player processes."""
+    def __init__(
+        self,
+        move_timeout: float | None = 1.0,   # Seconds a player has to answer each move request, None for no limit
+        move_limit: int | None = None,      # Moves before a game is a draw, 200 like MartianChessReferee if not given
+        first_player: str | None = None,    # Player who moves first, the bottom player if not given
+        board_class: type = MartianChessBoard,
+        max_games: int = 256,               # Games played at the same time
+    ):
+        self.move_timeout = move_timeout
+        self.move_limit = move_limit or 200
+        self.first_player = first_player or PlayerID.BOTTOM
+        self.board_class = board_class
+        self.max_games = max_games
+        self.game_ids = itertools.count()
+        self.players = asyncio.Queue() # Connections made to the server started by listen, waiting to be used
+
+
+    async def listen(self, host: str = "127.0.0.1", port: int = 0):
+        """Accepts player connections on a local TCP socket, queueing them in players. Returns the asyncio server"""
+        async def on_connect(reader, writer):
+            try:
+                await self.players.put(await PlayerConnection.accept(reader, writer))
+            except (ConnectionError, ValueError) as error:
+                print(f"Warning: Rejected player connection: {error}")
+                writer.close()
+        return await asyncio.start_server(on_connect, host, port)
+
+
+    async def play_game(self, top: PlayerConnection, bottom: PlayerConnection):
+        """Plays one game between two connections. Returns (winner, score, move count) like MatchRunner"""
+        game_id = next(self.game_ids)
+        game = self.board_class()
+        game.reset_board()
+        connections = {PlayerID.TOP: top, PlayerID.BOTTOM: bottom}
+        active_player_id = self.first_player
+
+        winner = False
+        move_count = 0
+        while not winner:
+            options = game.get_player_options(active_player_id)
+            try:
+                player_move = await connections[active_player_id].request_move(
+                    game_id, game.get_snapshot(), options, active_player_id, game.points[active_player_id], self.move_timeout
+                )
+            except asyncio.TimeoutError:
+                print(f"{active_player_id.upper()} Player ran out of time. They forfeit")
+                player_move = None
+            except ConnectionError:
+                print(f"{active_player_id.upper()} Player disconnected. They forfeit")
+                player_move = None
+            if not (isinstance(player_move, int) and player_move >= 0 and player_move < len(options)):
+                if player_move is not None:
+                    print(f"{active_player_id.upper()} Player made move out of possible range. They forfeit")
+                winner = self._get_other_player(active_player_id)
+                break
+
+            move = options[player_move]
+            if not game.make_move(active_player_id, move[0], move[1], move[2], move[3]):
+                raise Exception(f"Supposedly legal move was not able to be made: {move}. Active player: {active_player_id}")
+            move_count += 1
+
+            winner = game.is_game_over()
+            if winner:
+                break
+            active_player_id = self._get_other_player(active_player_id)
+
+            if move_count == self.move_limit:
+                # They both lose
+                await top.send({"type": "game_over", "game": game_id, "winner": False, "score": -100})
+                await bottom.send({"type": "game_over", "game": game_id, "winner": False, "score": -100})
+                return False, 0, move_count
+
+        loser = self._get_other_player(winner)
+        await connections[winner].send({"type": "game_over", "game": game_id, "winner": True, "score": game.points[winner] - game.points[loser]})
+        await connections[loser].send({"type": "game_over", "game": game_id, "winner": False, "score": game.points[loser] - game.points[winner]})
+        return winner, game.points[PlayerID.TOP] - game.points[PlayerID.BOTTOM], move_count
+
+
+    async def play_match(self, games: int, top_players: list, bottom_players: list, progress_every: int = 0):
+        """Plays the given number of games, up to max_games at once, and returns a MatchSummary.
+        Game i is played by top_players[i % len(top_players)] and bottom_players[i % len(bottom_players)]"""
+        summary = MatchSummary()
+        slots = asyncio.Semaphore(self.max_games)
+
+        async def play(i):
+            async with slots:
+                winner, score, move_count = await self.play_game(top_players[i % len(top_players)], bottom_players[i % len(bottom_players)])
+            summary.add(winner, score, move_count)
+            if progress_every and summary.games % progress_every == 0:
+                stats = summary.to_dict()
+                print(f"Games: {summary.games} | T Wins: {int(stats['top_win_rate'] * 100)}% | B Wins: {int(stats['bottom_win_rate'] * 100)}% | Draws: {int(stats['draw_rate'] * 100)}%")
+
+        await asyncio.gather(*(play(i) for i in range(games)))
+        return summary
+
+
+    def _get_other_player(self, player_id):
+        """Returns the other player ID when the current player is provided"""
+        if player_id == PlayerID.BOTTOM:
+            return PlayerID.TOP
+        else:
+            return PlayerID.BOTTOM
+
+
+async def run_match(args):
+    """Starts the player processes given on the command line, plays the match and prints its summary"""
+    server = MatchServer(args.move_timeout, args.move_limit, max_games=args.max_games)
+    top_players = [await PlayerConnection.spawn(shlex.split(args.top)) for _ in range(args.engines)]
+    bottom_players = [await PlayerConnection.spawn(shlex.split(args.bottom)) for _ in range(args.engines)]
+    try:
+        summary = await server.play_match(args.games, top_players, bottom_players, args.progress_every)
+    finally:
+        for connection in top_players + bottom_players:
+            await connection.close()
+    print(json.dumps(summary.to_dict(), indent=4))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a match between out-of-process players, many games at a time.")
+    parser.add_argument("--top", type=str, default=f"{sys.executable} -m game.player_host RandomPlayer", help="Command starting a top player process.")
+    parser.add_argument("--bottom", type=str, default=f"{sys.executable} -m game.player_host RandomPlayer", help="Command starting a bottom player process.")
+    parser.add_argument("--engines", type=int, default=1, help="Processes started for each side, games are spread over them (default: 1).")
+    parser.add_argument("--games", type=int, default=100, help="Number of games to play (default: 100).")
+    parser.add_argument("--max-games", type=int, default=256, help="Games played at the same time (default: 256).")
+    parser.add_argument("--move-timeout", type=float, default=1.0, help="Seconds allowed per move before a player forfeits (default: 1.0).")
+    parser.add_argument("--move-limit", type=int, default=None, help="Moves before a game is a draw (default: 200).")
+    parser.add_argument("--progress-every", type=int, default=0, help="Print a progress line every N games.")
+    asyncio.run(run_match(parser.parse_args()))
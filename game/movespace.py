@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+
+
+# Move spaces are shared by everything in the process using the same board size, keyed by (width, height)
+_MOVE_SPACES = {}
+
+# Move spaces are also cached on disk, since generating one runs move generation for every piece on every square
+MOVE_SPACE_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+
+
+def get_move_space(width, height):
+    """Returns the MoveSpace for a board of the given size, loading it from the disk cache or generating it on first use"""
+    key = (width, height)
+    if key not in _MOVE_SPACES:
+        _MOVE_SPACES[key] = MoveSpace(width, height, _load_moves(width, height))
+    return _MOVE_SPACES[key]
+
+
+def generate_moves(width, height):
+    """Return a list of all possible move coordinates on the given board size in a list of format (from_x, from_y, to_x, to_y)"""
+    # Setup an empty board
+    board = MartianChessBoard(width, height, False)
+
+    # Gather all moves by iterating piece types in every location
+    all_moves = []
+    for x in range(width):
+        for y in range(height):
+            for piece in range(3):
+                board.place(piece+1, x, y) # Place this type of piece at X/Y
+                all_moves.extend(board.get_player_options(PlayerID.TOP)) # Add all moves for this player
+                board.place(0, x, y) # Remove the piece we placed
+
+    # Gather unique elements from that huge list, keeping their order
+    return list(dict.fromkeys(all_moves))
+
+
+def _load_moves(width, height):
+    """Reads the moves of a board size from the disk cache, generating and caching them if needed"""
+    cache_file = os.path.join(MOVE_SPACE_CACHE_DIR, f"move_space_{width}x{height}.json")
+    try:
+        with open(cache_file) as file:
+            return [tuple(move) for move in json.load(file)]
+    except (OSError, ValueError):
+        pass # Missing or unreadable cache, generate it again
+
+    moves = generate_moves(width, height)
+    try:
+        os.makedirs(MOVE_SPACE_CACHE_DIR, exist_ok=True)
+        # Each process writes its own temporary file, so pool workers generating the same size at once never share one
+        with tempfile.NamedTemporaryFile("w", dir=MOVE_SPACE_CACHE_DIR, suffix=".tmp", delete=False) as file:
+            json.dump(moves, file)
+        os.replace(file.name, cache_file)
+    except OSError:
+        pass # The cache is only an optimization
+    return moves
+
+
+class MoveSpace:
+    """Every move that can ever be made on a board of a given size, with constant time move to index lookups.
+
+    The moves are seen from the top player, like NeuralnetPlayer's outputs. rotated_move_index maps a bottom
+    player's move in board coordinates to the index of the same move rotated 180 degrees."""
+    width: int
+    height: int
+    moves: list             # Moves in (from_x, from_y, to_x, to_y) format, in network output order
+    move_index: dict            # Maps a move to its index
+    rotated_move_index: dict    # Maps a move rotated 180 degrees to the index of the original move
+
+
+    def __init__(self, width, height, moves):
+        self.width = width
+        self.height = height
+        self.moves = moves
+        self.move_index = {move: i for i, move in enumerate(moves)}
+        w, h = width - 1, height - 1
+        self.rotated_move_index = {(w - fx, h - fy, w - tx, h - ty): i for i, (fx, fy, tx, ty) in enumerate(moves)}
+        self._array = None
+
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __getitem__(self, i):
+        return self.moves[i]
+
+    def __iter__(self):
+        return iter(self.moves)
+
+    def index(self, move):
+        """Returns the index of a move like list.index, raising ValueError if it is not in the move space"""
+        try:
+            return self.move_index[tuple(move)]
+        except KeyError:
+            raise ValueError(f"{move} is not in the move space") from None
+
+
+    @property
+    def array(self):
+        """(len, 4) NumPy array of the moves"""
+        if self._array is None:
+            import numpy as np # Only the neural players need NumPy
+            self._array = np.array(self.moves, dtype=np.int64).reshape(-1, 4)
+        return self._array
+
+
+    def get_indices(self, options, rotated: bool = False):
+        """Returns the list of move indices of the given options, looking them up rotated for the bottom player"""
+        index = self.rotated_move_index if rotated else self.move_index
+        return [index[option] for option in options]
+
+
+    def get_mask(self, options, rotated: bool = False):
+        """Returns a NumPy array of 1s and 0s marking the given options, built by scattering their indices"""
+        import numpy as np
+        mask = np.zeros(len(self.moves))
+        mask[self.get_indices(options, rotated)] = 1
+        return mask
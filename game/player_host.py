@@ -0,0 +1,62 @@
+import argparse
+import json
+import socket
+import sys
+import time
+
+from game.match_server import PROTOCOL_VERSION, decode_message, encode_message
+from game.snapshot import BoardSnapshot
+
+
+def serve_player(player_factory, reader, writer, name: str = "player", delay: float = 0.0):
+    """Answers match server requests read from reader (a binary file) with players built by player_factory.
+
+    Each game in progress gets its own player, since players may keep per-game state. Players are
+    reused for later games once theirs is over. delay adds seconds to every move, to stand in for a slow engine."""
+    writer.write(encode_message({"type": "hello", "name": name, "version": PROTOCOL_VERSION}))
+    writer.flush()
+    players = {} # Player of each game in progress, keyed by game id
+    idle_players = []
+    for line in reader:
+        message = decode_message(line)
+        if message["type"] == "move":
+            game_id = message["game"]
+            if game_id not in players:
+                players[game_id] = idle_players.pop() if idle_players else player_factory()
+            board = BoardSnapshot(message["width"], message["height"], bytes(map(int, message["board"])))
+            options = [tuple(option) for option in message["options"]]
+            move = players[game_id].make_move(board, options, message["player"], message["score"])
+            if delay:
+                time.sleep(delay)
+            writer.write(encode_message({"type": "move", "game": game_id, "move": move if isinstance(move, int) else None}))
+            writer.flush()
+        elif message["type"] == "game_over":
+            player = players.pop(message["game"], None)
+            if player:
+                player.game_over(message["winner"], message["score"])
+                idle_players.append(player)
+        elif message["type"] == "close":
+            break
+
+
+if __name__ == "__main__":
+    from players import get_player_class
+
+    parser = argparse.ArgumentParser(description="Serve a player to a match server over stdin/stdout or a socket.")
+    parser.add_argument("player", type=str, help="Registered player class name, such as RandomPlayer.")
+    parser.add_argument("--kwargs", type=json.loads, default={}, help="JSON object of keyword arguments for the player.")
+    parser.add_argument("--connect", type=str, default=None, help="host:port of a match server to connect to, instead of using stdin/stdout.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Extra seconds per move, to stand in for a slow engine.")
+    args = parser.parse_args()
+
+    player_class = get_player_class(args.player)
+    factory = lambda: player_class(**args.kwargs)
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        with socket.create_connection((host, int(port))) as connection, connection.makefile("rwb") as stream:
+            serve_player(factory, stream, stream, args.player, args.delay)
+    else:
+        # Messages go over the real stdout, anything the player prints is sent to stderr instead
+        protocol_out = sys.stdout.buffer
+        sys.stdout = sys.stderr
+        serve_player(factory, sys.stdin.buffer, protocol_out, args.player, args.delay)
@@ -0,0 +1,315 @@
+import os
+import struct
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.movespace import get_move_space
+
+
+# File layout
+#   Record file: header (magic, width, height, move width), followed by one record per game
+#   Index file:  one little endian uint64 per game, the offset of that game in the record file
+#
+# Game record
+#   flags        1 byte   bit 0: top moved first, bits 1-2: winner (0 none, 1 top, 2 bottom),
+#                         bit 3: won by forfeit, bit 4: a custom starting position follows
+#   top points   varint
+#   bottom pts   varint
+#   move count   varint
+#   start board  width * height 2 bit pieces (column major, like board[x][y]), only if flag bit 4 is set
+#   moves        one uint8 (or little endian uint16, if the move space has more than 256 moves, see the header's
+#                move width) per move, its index in the move space as seen by the player making it
+RECORD_MAGIC = b"MCR2"
+INDEX_SUFFIX = ".idx"
+
+FIRST_TOP = 0x01
+WINNER_SHIFT = 1
+WINNER_MASK = 0x06
+FORFEIT = 0x08
+CUSTOM_START = 0x10
+
+_WINNER_CODES = {None: 0, PlayerID.TOP: 1, PlayerID.BOTTOM: 2}
+_WINNERS = {code: winner for winner, code in _WINNER_CODES.items()}
+
+# Default starting boards, keyed by (width, height)
+_DEFAULT_BOARDS = {}
+
+
+def _get_default_board(width, height):
+    """Returns the default starting board of the given size as a list of lists"""
+    key = (width, height)
+    if key not in _DEFAULT_BOARDS:
+        _DEFAULT_BOARDS[key] = [list(column) for column in MartianChessBoard(width, height).board]
+    return _DEFAULT_BOARDS[key]
+
+
+def _write_varint(buffer: bytearray, value: int):
+    """Appends an unsigned LEB128 varint, so values below 128 take one byte"""
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(file):
+    """Reads an unsigned LEB128 varint from a file, returning None at the end of the file"""
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Game record ends in the middle of a value")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def _pack_board(board, width, height):
+    """Packs a board into 2 bits per square"""
+    packed = bytearray((width * height + 3) // 4)
+    for x in range(width):
+        for y in range(height):
+            square = x * height + y
+            packed[square >> 2] |= board[x][y] << (square & 3) * 2
+    return packed
+
+
+def _unpack_board(packed, width, height):
+    """Unpacks a board packed by _pack_board into a list of lists"""
+    return [[packed[(x * height + y) >> 2] >> ((x * height + y) & 3) * 2 & 3 for y in range(height)] for x in range(width)]
+
+
+class GameRecord:
+    """One recorded game: its starting position, moves in board coordinates and result"""
+    width: int
+    height: int
+    first_player: str   # PlayerID of the player who moved first
+    start_board: list   # Starting position as a list of lists, indexed board[x][y]
+    moves: list         # Moves in (from_x, from_y, to_x, to_y) format, in the order they were made
+    winner: str | None  # PlayerID of the winner, or None for a game ended by the move limit
+    forfeit: bool       # Whether the loser forfeited by making an illegal move
+    points: dict        # Final points, keyed by PlayerID
+
+
+    def __init__(self, width, height, first_player, start_board, moves, winner, forfeit, points):
+        self.width = width
+        self.height = height
+        self.first_player = first_player
+        self.start_board = start_board
+        self.moves = moves
+        self.winner = winner
+        self.forfeit = forfeit
+        self.points = points
+
+
+    def __repr__(self):
+        return f"GameRecord({len(self.moves)} moves, winner={self.winner}, points={self.points})"
+
+
+    def replay(self, board_class: type = MartianChessBoard):
+        """Generator that plays the game back, yielding (player, move, board) after every move. The same board object is yielded each time"""
+        board = board_class(self.width, self.height)
+        board.set_board(self.start_board)
+        player = self.first_player
+        for move in self.moves:
+            if not board.make_move(player, *move):
+                raise ValueError(f"Recorded move could not be made: {move}. Active player: {player}")
+            yield player, move, board
+            player = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+
+
+class GameRecordWriter:
+    """Streams games into a record file and its index, appending to them if they already exist.
+
+    A game is buffered in memory while it is played and written in one go by end_game, so a record file
+    only ever holds complete games."""
+    path: str       # Path of the record file, the index is stored next to it with INDEX_SUFFIX
+    width: int
+    height: int
+    games: int      # Number of games in the file, including ones written before it was opened
+
+
+    def __init__(self, path: str, width: int = 4, height: int = 8):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.move_space = get_move_space(width, height)
+        self.move_width = 1 if len(self.move_space) <= 256 else 2 # Bytes per stored move
+        self.recording = False
+
+        header = RECORD_MAGIC + bytes((width, height, self.move_width))
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                if file.read(len(header)) != header:
+                    raise ValueError(f"{path} is not a {width}x{height} game record file")
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(header)
+        self.index_file = open(path + INDEX_SUFFIX, "ab")
+        self.games = self.index_file.tell() // 8
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def begin_game(self, board, first_player: str):
+        """Starts recording a game from the given starting board (indexable as board[x][y])"""
+        self.first_player = first_player
+        self.player = first_player
+        self.moves = bytearray()
+        self.move_count = 0
+        self.start_board = None if self._is_default(board) else _pack_board(board, self.width, self.height)
+        self.recording = True
+
+
+    def _is_default(self, board):
+        default = _get_default_board(self.width, self.height)
+        return all(list(board[x]) == default[x] for x in range(self.width))
+
+
+    def record_move(self, move):
+        """Records the next move in (from_x, from_y, to_x, to_y) format, made by the player whose turn it is"""
+        rotated = self.player == PlayerID.BOTTOM # Moves are indexed as seen from the top player
+        index = (self.move_space.rotated_move_index if rotated else self.move_space.move_index)[tuple(move)]
+        if self.move_width == 1:
+            self.moves.append(index)
+        else:
+            self.moves += struct.pack("<H", index)
+        self.move_count += 1
+        self.player = PlayerID.TOP if rotated else PlayerID.BOTTOM
+
+
+    def end_game(self, winner: str | None, points: dict, forfeit: bool = False):
+        """Writes the game being recorded with its result and final points, and adds it to the index"""
+        if not self.recording:
+            raise ValueError("end_game called without begin_game")
+        flags = _WINNER_CODES[winner] << WINNER_SHIFT
+        if self.first_player == PlayerID.TOP:
+            flags |= FIRST_TOP
+        if forfeit:
+            flags |= FORFEIT
+        if self.start_board is not None:
+            flags |= CUSTOM_START
+
+        record = bytearray((flags,))
+        _write_varint(record, points.get(PlayerID.TOP, 0))
+        _write_varint(record, points.get(PlayerID.BOTTOM, 0))
+        _write_varint(record, self.move_count)
+        if self.start_board is not None:
+            record += self.start_board
+        record += self.moves
+
+        self.index_file.write(struct.pack("<Q", self.file.tell()))
+        self.file.write(record)
+        self.games += 1
+        self.recording = False
+
+
+    def flush(self):
+        """Flushes written games to disk"""
+        self.file.flush()
+        self.index_file.flush()
+
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+
+class GameRecordReader:
+    """Reads a record file written by GameRecordWriter.
+
+    Iterating streams every game from the start of the file without loading it all into memory, and
+    reader[n] seeks straight to game n through the index."""
+    path: str
+    width: int
+    height: int
+
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            header = file.read(len(RECORD_MAGIC) + 3)
+        if len(header) != len(RECORD_MAGIC) + 3 or header[:len(RECORD_MAGIC)] != RECORD_MAGIC or header[-1] not in (1, 2):
+            raise ValueError(f"{path} is not a game record file")
+        self.width, self.height, self.move_width = header[len(RECORD_MAGIC):]
+        self.move_space = get_move_space(self.width, self.height)
+
+
+    def __len__(self):
+        return os.path.getsize(self.path + INDEX_SUFFIX) // 8
+
+
+    def __getitem__(self, n: int):
+        count = len(self)
+        if n < 0:
+            n += count
+        if not 0 <= n < count:
+            raise IndexError(f"Game {n} is out of range, the file holds {count} games")
+        with open(self.path + INDEX_SUFFIX, "rb") as index_file:
+            index_file.seek(n * 8)
+            offset, = struct.unpack("<Q", index_file.read(8))
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return self._read_game(file)
+
+
+    def __iter__(self):
+        with open(self.path, "rb", buffering=1 << 16) as file:
+            file.seek(len(RECORD_MAGIC) + 3)
+            while True:
+                game = self._read_game(file)
+                if game is None:
+                    return
+                yield game
+
+
+    def _read_game(self, file):
+        """Reads one game record at the current position of the file, returning None at the end of the file"""
+        flags = file.read(1)
+        if not flags:
+            return None
+        flags = flags[0]
+        top_points = _read_varint(file)
+        bottom_points = _read_varint(file)
+        move_count = _read_varint(file)
+        if move_count is None:
+            raise ValueError("Game record ends in the middle of a game")
+
+        if flags & CUSTOM_START:
+            start_board = _unpack_board(file.read((self.width * self.height + 3) // 4), self.width, self.height)
+        else:
+            start_board = [list(column) for column in _get_default_board(self.width, self.height)]
+
+        # Moves alternate between players, and the bottom player's moves are stored rotated
+        w, h = self.width - 1, self.height - 1
+        rotated = not flags & FIRST_TOP
+        data = file.read(move_count * self.move_width)
+        if len(data) != move_count * self.move_width:
+            raise ValueError("Game record ends in the middle of a game")
+        indices = data if self.move_width == 1 else struct.unpack(f"<{move_count}H", data)
+        moves = []
+        for index in indices:
+            from_x, from_y, to_x, to_y = self.move_space[index]
+            if rotated:
+                from_x, from_y, to_x, to_y = w - from_x, h - from_y, w - to_x, h - to_y
+            moves.append((from_x, from_y, to_x, to_y))
+            rotated = not rotated
+
+        return GameRecord(
+            self.width,
+            self.height,
+            PlayerID.TOP if flags & FIRST_TOP else PlayerID.BOTTOM,
+            start_board,
+            moves,
+            _WINNERS[(flags & WINNER_MASK) >> WINNER_SHIFT],
+            bool(flags & FORFEIT),
+            {PlayerID.TOP: top_points, PlayerID.BOTTOM: bottom_points},
+        )
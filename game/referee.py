@@ -1,70 +1,111 @@
-from copy import deepcopy
+from time import perf_counter
+
 from game.board import MartianChessBoard
 from game.enum import PlayerID
-from game.view import MartianChessView
+from game.record import GameRecordWriter
+from game.stats import RefereeStats
 from players.base import BasePlayer
 
 
 class MartianChessReferee:
-    def __init__(self, top_player: BasePlayer, bottom_player: BasePlayer, display_board: bool = True, first_player: str | None = None, move_limit: int | None = None):
-        self.game = MartianChessBoard()
+    def __init__(self, top_player: BasePlayer, bottom_player: BasePlayer, display_board: bool = True, first_player: str | None = None, move_limit: int | None = None, board_class: type = MartianChessBoard, recorder: GameRecordWriter | None = None, stats: RefereeStats | None = None, display_fps: float | None = None, display_skip_frames: int = 0):
+        self.game = board_class() # Any MartianChessBoard backend, such as BitboardMartianChessBoard
         self.display_board = display_board
         if display_board:
-            self.view = MartianChessView()
+            from game.view import MartianChessView # Imported here so headless games never load tkinter
+            self.view = MartianChessView(display_fps, display_skip_frames) # Optionally drawing fewer frames, so watching does not slow games down
         self.top_player = top_player
         self.bottom_player = bottom_player
         self.first_player = first_player or PlayerID.BOTTOM
         self.move_limit = move_limit or 200
+        self.move_count = 0 # Moves made in the current (or last) game
+        self.recorder = recorder # Optional GameRecordWriter every game is streamed into
+        self.stats = stats # Optional RefereeStats collecting per-move timings and counters
 
 
     def play_round(self):
         """Plays one game with the two players provided during referee creation. Returns the PlayerID of the winner"""
+        stats = self.stats # Every timing below is skipped when instrumentation is disabled
+        if stats:
+            game_start = perf_counter()
+
         # Reset board state
         self.game.reset_board()
         self.active_player_id = self.first_player
+        if self.recorder:
+            self.recorder.begin_game(self.game.board, self.first_player)
 
         # Game loop
         winner = False
-        move_count = 0
+        self.move_count = 0
         while not winner:
             if self.display_board:
-                self.view.redraw(self.game.board) # Update view
+                self.view.redraw(self.game.board, self.game.last_move) # Update view
 
             # Get options for player
             player_object = self._get_player_object(self.active_player_id)
+            if stats:
+                start = perf_counter()
             options = self.game.get_player_options(self.active_player_id)
+            if stats:
+                stats.options_time += perf_counter() - start
+                start = perf_counter()
 
             # Ask player to make move
             player_move = player_object.make_move(              # Kindly ask the player to make a move
-                deepcopy(self.game.board),                      # Giving them the board state,
+                self.game.get_snapshot(),                       # Giving them a read-only board state,
                 options,                                        # Legal moves list,
                 self.active_player_id,                          # Player ID,
                 self._get_player_score(self.active_player_id)   # And current score.
             )
+            if stats:
+                stats.add_player_move(self.active_player_id, perf_counter() - start)
             if not (isinstance(player_move, int) and player_move >= 0 and player_move < len(options)):
                 print(f"{self.active_player_id.upper()} Player made move out of possible range. They forfeit")
                 winner = self._get_other_player(self.active_player_id)
+                if self.recorder:
+                    self.recorder.end_game(winner, self.game.points, forfeit=True)
+                if stats:
+                    stats.add_game(winner, self.move_count, perf_counter() - game_start, forfeit=True)
                 break
 
             # Make the move
             move = options[player_move]
+            if stats:
+                start = perf_counter()
             success = self.game.make_move(self.active_player_id, move[0], move[1], move[2], move[3])
+            if stats:
+                stats.make_move_time += perf_counter() - start
             if not success:
                 raise Exception(f"Supposedly legal move was not able to be made: {move}. Active player: {self.active_player_id}")
+            self.move_count += 1
+            if self.recorder:
+                self.recorder.record_move(move)
             
             # Check for game over
+            if stats:
+                start = perf_counter()
             game_over = self.game.is_game_over()
+            if stats:
+                stats.game_over_time += perf_counter() - start
             if game_over:
                 winner = game_over
+                if self.recorder:
+                    self.recorder.end_game(winner, self.game.points)
+                if stats:
+                    stats.add_game(winner, self.move_count, perf_counter() - game_start)
                 break
 
             # Switch players
             self.active_player_id = self._get_other_player(self.active_player_id)
             
             # Limit max moves
-            move_count += 1
-            if move_count == self.move_limit:
+            if self.move_count == self.move_limit:
                 # They both lose
+                if self.recorder:
+                    self.recorder.end_game(None, self.game.points)
+                if stats:
+                    stats.add_game(None, self.move_count, perf_counter() - game_start)
                 other = self._get_other_player(self.active_player_id)
                 self._get_player_object(self.active_player_id).game_over(False, -100)
                 self._get_player_object(other).game_over(False, -100)
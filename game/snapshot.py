@@ -0,0 +1,68 @@
+class BoardSnapshot:
+    """Immutable view of a board state backed by a single bytes buffer (column major, like board[x][y]).
+
+    Players can index it as board[x][y], iterate over its columns, or pass it straight to NumPy
+    (np.asarray(board) gives a read-only uint8 array of shape (width, height) without copying)."""
+    width: int      # Number of columns
+    height: int     # Number of rows
+    data: bytes     # Piece values, where the piece at x,y is data[x * height + y]
+
+
+    def __init__(self, width: int, height: int, data: bytes):
+        self.width = width
+        self.height = height
+        self.data = data
+        self._columns = None # Column views are only built if a player indexes the snapshot
+
+
+    @classmethod
+    def from_board(cls, board):
+        """Creates a snapshot from anything indexable as board[x][y], such as a list of lists"""
+        return cls(len(board), len(board[0]), bytes(piece for column in board for piece in column))
+
+
+    @property
+    def columns(self):
+        """Tuple of read-only memoryviews, one per column"""
+        if self._columns is None:
+            view = memoryview(self.data)
+            self._columns = tuple(view[x * self.height:(x + 1) * self.height] for x in range(self.width))
+        return self._columns
+
+
+    def __getitem__(self, x):
+        return self.columns[x]
+
+    def __len__(self):
+        return self.width
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __eq__(self, other):
+        if isinstance(other, BoardSnapshot):
+            return self.width == other.width and self.data == other.data
+        return self.tolist() == other
+
+    def __hash__(self):
+        return hash((self.width, self.data))
+
+    def __copy__(self):
+        return self # Snapshots never change, so a copy is the same object
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"BoardSnapshot({self.tolist()})"
+
+
+    @property
+    def __array_interface__(self):
+        """Lets NumPy wrap the bytes buffer directly as a read-only (width, height) array"""
+        return {"shape": (self.width, self.height), "typestr": "|u1", "data": self.data, "version": 3}
+
+
+    def tolist(self):
+        """Returns a mutable list of lists copy of the board"""
+        return [list(column) for column in self.columns]
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import time
+
+from game.enum import PlayerID
+
+
+class RefereeStats:
+    """Timing and counters collected by MartianChessReferee.play_round when instrumentation is enabled.
+
+    Times are wall clock seconds. Player times cover each player.make_move call, and engine times cover
+    the referee's get_player_options, make_move and is_game_over calls. If a dump file is given, the stats
+    are written to it every dump_every games: .json files are overwritten with the latest totals, any
+    other file gets one CSV row appended per dump."""
+    games: int                  # Games played
+    draws: int                  # Games that hit the move limit
+    forfeits: int               # Games lost by making an illegal move
+    wins: dict                  # Games won, keyed by PlayerID
+    moves: int                  # Moves made over all games
+    player_calls: dict          # player.make_move calls, keyed by PlayerID
+    player_time: dict           # Total time in player.make_move, keyed by PlayerID
+    player_max_time: dict       # Slowest single player.make_move call, keyed by PlayerID
+    options_time: float         # Total time in get_player_options
+    make_move_time: float       # Total time in the board's make_move
+    game_over_time: float       # Total time in is_game_over
+    game_time: float            # Total time of the game loops in play_round (players' game_over calls are not included)
+
+
+    def __init__(self, dump_file: str | None = None, dump_every: int = 100):
+        self.dump_file = dump_file
+        self.dump_every = dump_every
+        self.reset()
+
+
+    def reset(self):
+        """Clears every counter and restarts the games/sec clock"""
+        self.games = self.draws = self.forfeits = self.moves = 0
+        self.wins = {PlayerID.TOP: 0, PlayerID.BOTTOM: 0}
+        self.player_calls = {PlayerID.TOP: 0, PlayerID.BOTTOM: 0}
+        self.player_time = {PlayerID.TOP: 0.0, PlayerID.BOTTOM: 0.0}
+        self.player_max_time = {PlayerID.TOP: 0.0, PlayerID.BOTTOM: 0.0}
+        self.options_time = self.make_move_time = self.game_over_time = self.game_time = 0.0
+        self.start_time = time.perf_counter()
+
+
+    def add_player_move(self, player: str, seconds: float):
+        """Records one player.make_move call"""
+        self.player_calls[player] += 1
+        self.player_time[player] += seconds
+        if seconds > self.player_max_time[player]:
+            self.player_max_time[player] = seconds
+
+
+    def add_game(self, winner: str | None, move_count: int, seconds: float, forfeit: bool = False):
+        """Records the result of one game, dumping the stats if a dump is due"""
+        self.games += 1
+        self.moves += move_count
+        self.game_time += seconds
+        if winner:
+            self.wins[winner] += 1
+        else:
+            self.draws += 1
+        if forfeit:
+            self.forfeits += 1
+        if self.dump_file and self.dump_every and self.games % self.dump_every == 0:
+            self.dump()
+
+
+    def to_dict(self):
+        """Returns the stats as a flat dictionary of totals, rates and averages"""
+        games = max(self.games, 1)
+        elapsed = time.perf_counter() - self.start_time
+        engine_time = self.options_time + self.make_move_time + self.game_over_time
+        stats = {
+            "games": self.games,
+            "moves": self.moves,
+            "draws": self.draws,
+            "forfeits": self.forfeits,
+            "draw_rate": self.draws / games,
+            "average_moves": self.moves / games,
+            "elapsed": elapsed,
+            "games_per_sec": self.games / elapsed if elapsed > 0 else 0.0,
+            "moves_per_sec": self.moves / self.game_time if self.game_time > 0 else 0.0,
+            "options_time": self.options_time,
+            "make_move_time": self.make_move_time,
+            "game_over_time": self.game_over_time,
+            "engine_time": engine_time,
+            "game_time": self.game_time,
+        }
+        for player in (PlayerID.TOP, PlayerID.BOTTOM):
+            calls = max(self.player_calls[player], 1)
+            stats[f"{player}_wins"] = self.wins[player]
+            stats[f"{player}_calls"] = self.player_calls[player]
+            stats[f"{player}_time"] = self.player_time[player]
+            stats[f"{player}_average_time"] = self.player_time[player] / calls
+            stats[f"{player}_max_time"] = self.player_max_time[player]
+        stats["referee_time"] = self.game_time - engine_time - self.player_time[PlayerID.TOP] - self.player_time[PlayerID.BOTTOM]
+        return stats
+
+
+    def dump(self, path: str | None = None):
+        """Writes the stats to a JSON file (overwritten) or appends them as a row to a CSV file"""
+        path = path or self.dump_file
+        stats = self.to_dict()
+        if path.endswith(".json"):
+            with open(path + ".tmp", "w") as file:
+                json.dump(stats, file, indent=4)
+            os.replace(path + ".tmp", path)
+        else:
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, "a", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=list(stats))
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(stats)
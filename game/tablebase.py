@@ -0,0 +1,346 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from array import array
+from math import comb
+
+import numpy as np
+
+from game.bitboard import BitboardMartianChessBoard
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+
+
+# Each position stores two bounds on Q, the final result from the side to move's point of view, where
+# Q = 2 * (points the mover gains from here on - points the opponent gains) + (1 if the mover ends the game, else -1).
+# With d = the mover's current points minus the opponent's, the mover wins a game that ends with 2 * d + Q > 0, which
+# covers the tie-break rule. Storing Q instead of results keeps one table valid for every score.
+#   best:  highest Q the mover can force while also forcing the game to end (-FORCED if it cannot force an end)
+#   worst: lowest Q the opponent can force while also forcing the game to end (FORCED if it cannot)
+# A mover with no legal moves forfeits, which is stored as best = worst = -FORCED.
+TABLEBASE_DTYPE = np.dtype([("best", np.int8), ("worst", np.int8), ("best_plies", np.uint8), ("worst_plies", np.uint8)])
+FORCED = 127    # Stands for an unbounded value: endless play, or a result that does not depend on points
+MISSING = -128  # Marks slots of the index that are not positions of the table
+
+
+class TablebaseIndexer:
+    """Maps positions with up to max_pieces pieces to dense indices in O(1).
+
+    A position is the set of occupied squares (ranked in the combinatorial number system), their piece types
+    (base 3 digits), the player to move, and the canal rejection in effect: which of the mover's pieces just
+    crossed, and from which square of the other region it came."""
+    width: int
+    height: int
+    max_pieces: int
+    size: int               # Number of slots in the index
+
+
+    def __init__(self, width: int, height: int, max_pieces: int):
+        self.width = width
+        self.height = height
+        self.max_pieces = max_pieces
+        self.squares = width * height
+
+        # Regions each player controls, from the board's own ownership rule
+        board = MartianChessBoard(width, height, False)
+        self.players = [PlayerID.TOP, PlayerID.BOTTOM]
+        self.region_masks = {}
+        for player in self.players:
+            mask = 0
+            for x in range(width):
+                for y in range(height):
+                    if board.check_piece_ownership(player, x, y):
+                        mask |= 1 << (x * height + y)
+            self.region_masks[player] = mask
+
+        # origins[player][piece][sq] lists the squares of the other region that piece could have crossed to sq from
+        self.origins = {}
+        for player, other in ((PlayerID.TOP, PlayerID.BOTTOM), (PlayerID.BOTTOM, PlayerID.TOP)):
+            self.origins[player] = [[()] * self.squares]
+            for piece in (1, 2, 3):
+                piece_origins = []
+                for sq in range(self.squares):
+                    x, y = divmod(sq, height)
+                    squares = [cx * height + cy for ray in board.rays[piece][x][y] for cx, cy in ray]
+                    piece_origins.append(tuple(o for o in squares if self.region_masks[other] >> o & 1) if self.region_masks[player] >> sq & 1 else ())
+                self.origins[player].append(piece_origins)
+        self.max_origins = max(len(o) for player in self.players for piece in (1, 2, 3) for o in self.origins[player][piece])
+
+        # Slots of each piece count start where the smaller counts end. Positions need a piece in both regions, so at least 2
+        self.offsets = [0] * (max_pieces + 2)
+        for k in range(2, max_pieces + 1):
+            self.offsets[k + 1] = self.offsets[k] + comb(self.squares, k) * 3 ** k * 2 * self.get_rejection_slots(k)
+        self.offsets[2] = 0
+        self.size = self.offsets[max_pieces + 1]
+
+
+    def get_rejection_slots(self, k):
+        """Number of canal rejection codes for a position with k pieces, including 0 for no rejection"""
+        return 1 + k * self.max_origins
+
+
+    def get_index(self, squares, pieces, player, rejection=None):
+        """Returns the index of the position with the given sorted occupied squares and their pieces.
+        rejection is an optional (square, origin) pair: the mover's piece on square may not move back to origin"""
+        k = len(squares)
+        rank = 0
+        type_rank = 0
+        for i, (sq, piece) in enumerate(zip(squares, pieces)):
+            rank += comb(sq, i + 1)
+            type_rank += (piece - 1) * 3 ** i
+        code = 0
+        if rejection is not None:
+            sq, origin = rejection
+            slot = squares.index(sq)
+            code = 1 + slot * self.max_origins + self.origins[player][pieces[slot]][sq].index(origin)
+        return self.offsets[k] + ((rank * 3 ** k + type_rank) * 2 + (player == PlayerID.BOTTOM)) * self.get_rejection_slots(k) + code
+
+
+    def get_board_index(self, board: MartianChessBoard, player: str):
+        """Returns the index of a board position with the given player to move, or None if the table does not cover it"""
+        data = board.get_snapshot().data
+        squares = [sq for sq in range(self.squares) if data[sq]]
+        if not 2 <= len(squares) <= self.max_pieces:
+            return None
+        occupied = sum(1 << sq for sq in squares)
+        if not occupied & self.region_masks[PlayerID.TOP] or not occupied & self.region_masks[PlayerID.BOTTOM]:
+            return None # The game is already over
+        pieces = [data[sq] for sq in squares]
+        return self.get_index(squares, pieces, player, self.get_rejection(board, player, squares, pieces))
+
+
+    def get_rejection(self, board, player, squares, pieces):
+        """Returns the (square, origin) canal rejection of a board, or None"""
+        last_move = board.last_move
+        if last_move.get("crosses") != True:
+            return None
+        sq = last_move["to_x"] * self.height + last_move["to_y"]
+        origin = last_move["from_x"] * self.height + last_move["from_y"]
+        if sq not in squares or origin not in self.origins[player][pieces[squares.index(sq)]][sq]:
+            return None
+        return sq, origin
+
+
+def generate_tablebase(path: str, width: int = 4, height: int = 8, max_pieces: int = 3, verbose: bool = True):
+    """Solves every position with up to max_pieces pieces by retrograde analysis and writes the table to path (.npy)
+    with its metadata next to it (path + ".json")"""
+    start = time.perf_counter()
+    indexer = TablebaseIndexer(width, height, max_pieces)
+    board = BitboardMartianChessBoard(width, height, False)
+    top_mask, bottom_mask = indexer.region_masks[PlayerID.TOP], indexer.region_masks[PlayerID.BOTTOM]
+
+    # Enumerate every position and its moves. Each move either ends the game with a known Q, or leads to another
+    # position of the table (moves never add pieces) after gaining some points
+    states = array("q")         # Index of each position
+    edge_starts = array("q")    # First move of each position
+    edge_children = array("q")  # Index of the position a move leads to, -1 if it ends the game
+    edge_values = array("b")    # Q of a move that ends the game, otherwise 2 * the points it gains
+    for k in range(2, max_pieces + 1):
+        for squares in itertools.combinations(range(indexer.squares), k):
+            occupied = sum(1 << sq for sq in squares)
+            if not occupied & top_mask or not occupied & bottom_mask:
+                continue
+            for pieces in itertools.product((1, 2, 3), repeat=k):
+                masks = [0, 0, 0, 0]
+                for sq, piece in zip(squares, pieces):
+                    masks[piece] |= 1 << sq
+                for player in indexer.players:
+                    other = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+                    rejections = [None] + [
+                        (sq, origin) for sq, piece in zip(squares, pieces) for origin in indexer.origins[player][piece][sq] if not occupied >> origin & 1
+                    ]
+                    for rejection in rejections:
+                        board.pawns, board.drones, board.queens = masks[1], masks[2], masks[3]
+                        board.points = {PlayerID.TOP: 0, PlayerID.BOTTOM: 0}
+                        board.last_move = {"player": other}
+                        if rejection:
+                            (to_x, to_y), (from_x, from_y) = divmod(rejection[0], height), divmod(rejection[1], height)
+                            board.last_move = {"player": other, "from_x": from_x, "from_y": from_y, "to_x": to_x, "to_y": to_y, "crosses": True}
+                        states.append(indexer.get_index(squares, pieces, player, rejection))
+                        edge_starts.append(len(edge_children))
+                        for option in board.get_player_options(player):
+                            board.push_move(player, option[0], option[1], option[2], option[3])
+                            gain = board.points[player]
+                            child_occupied = board.pawns | board.drones | board.queens
+                            if not child_occupied & top_mask or not child_occupied & bottom_mask:
+                                edge_children.append(-1)
+                                edge_values.append(2 * gain + 1) # The mover ended the game
+                            else:
+                                child_squares = []
+                                child_pieces = []
+                                remaining = child_occupied
+                                while remaining:
+                                    bit = remaining & -remaining
+                                    remaining ^= bit
+                                    child_squares.append(bit.bit_length() - 1)
+                                    child_pieces.append(1 if board.pawns & bit else (2 if board.drones & bit else 3))
+                                edge_children.append(indexer.get_index(child_squares, child_pieces, other, indexer.get_rejection(board, other, child_squares, child_pieces)))
+                                edge_values.append(2 * gain)
+                            board.pop_move()
+        if verbose:
+            print(f"Enumerated positions with up to {k} pieces: {len(states)} positions, {len(edge_children)} moves ({time.perf_counter() - start:.1f}s)")
+
+    # Turn child indices into positions of the state list
+    states = np.frombuffer(states, dtype=np.int64)
+    edge_starts = np.frombuffer(edge_starts, dtype=np.int64)
+    edge_children = np.frombuffer(edge_children, dtype=np.int64)
+    edge_values = np.frombuffer(edge_values, dtype=np.int8).astype(np.int16)
+    position_of = np.full(indexer.size, -1, dtype=np.int64)
+    position_of[states] = np.arange(len(states))
+    terminal = edge_children < 0
+    children = np.where(terminal, 0, position_of[np.maximum(edge_children, 0)])
+    assert not (children[~terminal] < 0).any(), "A move led to a position missing from the table"
+
+    best, worst, best_plies, worst_plies = solve_positions(len(states), edge_starts, children, edge_values, terminal, verbose)
+
+    # Write the table, every slot that is not a position is marked MISSING
+    table = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=TABLEBASE_DTYPE, shape=(indexer.size,))
+    table["best"] = MISSING
+    table["worst"] = MISSING
+    table["best_plies"] = 0
+    table["worst_plies"] = 0
+    table["best"][states] = best
+    table["worst"][states] = worst
+    table["best_plies"][states] = best_plies
+    table["worst_plies"][states] = worst_plies
+    table.flush()
+    del table
+    os.replace(path + ".tmp", path)
+    with open(path + ".json", "w") as file:
+        json.dump({"width": width, "height": height, "max_pieces": max_pieces, "size": indexer.size, "positions": len(states)}, file)
+    if verbose:
+        print(f"Tablebase saved to {path} ({time.perf_counter() - start:.1f}s)")
+
+
+def solve_positions(count, edge_starts, children, edge_values, terminal, verbose=False):
+    """Finds best and worst (see TABLEBASE_DTYPE) of every position by iterating to a fixed point.
+
+    After n rounds, best is what the mover can force within n plies, so it only grows, and worst only shrinks.
+    The round in which each value last changed is kept as the number of plies needed to force it."""
+    has_moves = np.diff(np.append(edge_starts, len(children))) > 0
+    starts = edge_starts[has_moves]
+    best = np.full(count, -FORCED, dtype=np.int16)
+    worst = np.full(count, FORCED, dtype=np.int16)
+    best_plies = np.zeros(count, dtype=np.int64)
+    worst_plies = np.zeros(count, dtype=np.int64)
+    worst[~has_moves] = -FORCED # No legal moves, the mover forfeits
+
+    def move_values(opponent):
+        """Q of every move for the mover, given a bound of the opponent's Q in the position it leads to"""
+        child = opponent[children]
+        values = edge_values - child
+        values = np.where(child == FORCED, -FORCED, np.where(child == -FORCED, FORCED, values))
+        return np.where(terminal, edge_values, values)
+
+    rounds = 0
+    while True:
+        rounds += 1
+        new_best = best.copy()
+        new_worst = worst.copy()
+        new_best[has_moves] = np.maximum.reduceat(move_values(worst), starts)
+        new_worst[has_moves] = np.maximum.reduceat(move_values(best), starts)
+        changed_best = new_best != best
+        changed_worst = new_worst != worst
+        if not changed_best.any() and not changed_worst.any():
+            break
+        best_plies[changed_best] = rounds
+        worst_plies[changed_worst] = rounds
+        best, worst = new_best, new_worst
+        if verbose:
+            print(f"Round {rounds}: {np.count_nonzero(changed_best)} best and {np.count_nonzero(changed_worst)} worst values changed")
+
+    return best.astype(np.int8), worst.astype(np.int8), np.minimum(best_plies, 255).astype(np.uint8), np.minimum(worst_plies, 255).astype(np.uint8)
+
+
+class EndgameTablebase:
+    """Memory-mapped endgame tablebase written by generate_tablebase. Lookups read a single entry, so the
+    table is never loaded into memory as a whole"""
+    width: int
+    height: int
+    max_pieces: int
+
+
+    def __init__(self, path: str):
+        with open(path + ".json") as file:
+            meta = json.load(file)
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.max_pieces = meta["max_pieces"]
+        self.indexer = TablebaseIndexer(self.width, self.height, self.max_pieces)
+        self.table = np.load(path, mmap_mode="r")
+        if len(self.table) != self.indexer.size:
+            raise ValueError(f"Tablebase {path} does not match its metadata")
+        self.initial_material = sum(map(sum, MartianChessBoard(self.width, self.height).board))
+
+
+    def probe(self, board: MartianChessBoard, player: str):
+        """Returns the (best, worst, best_plies, worst_plies) entry of a position with the given player to move, or None if it is not covered"""
+        index = self.indexer.get_board_index(board, player)
+        if index is None:
+            return None
+        entry = self.table[index]
+        if entry["best"] == MISSING:
+            return None
+        return int(entry["best"]), int(entry["worst"]), int(entry["best_plies"]), int(entry["worst_plies"])
+
+
+    def get_outcome(self, board: MartianChessBoard, player: str):
+        """Returns 1 if the player to move can force a win, -1 if the opponent can, 0 for a draw (neither can force the game to end
+        in their favour) and None if the position is not covered. Uses the points on the board"""
+        entry = self.probe(board, player)
+        if entry is None:
+            return None
+        best, worst = entry[0], entry[1]
+        other = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+        lead = 2 * (board.points[player] - board.points[other])
+        if best != -FORCED and lead + best > 0 or best == FORCED:
+            return 1
+        if worst != FORCED and lead + worst < 0 or worst == -FORCED:
+            return -1
+        return 0
+
+
+    def get_best_option(self, board: MartianChessBoard, player: str, options: list | None = None):
+        """Returns the index of the option with the best outcome (fastest win, slowest loss), or None if the position is not covered"""
+        if options is None:
+            options = board.get_player_options(player)
+        if not options or self.probe(board, player) is None:
+            return None
+        other = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+        best_option = None
+        best_rank = None
+        for i, option in enumerate(options):
+            board.push_move(player, option[0], option[1], option[2], option[3])
+            winner = board.is_game_over()
+            if winner:
+                outcome, plies = (1 if winner == player else -1), 0
+            else:
+                entry = self.probe(board, other)
+                outcome = -self.get_outcome(board, other)
+                plies = entry[3] if outcome > 0 else entry[2] # Plies the opponent needs to lose, or to win
+            board.pop_move()
+            rank = (outcome, -plies if outcome > 0 else plies)
+            if best_rank is None or rank > best_rank:
+                best_option, best_rank = i, rank
+        return best_option
+
+
+    def fill_points(self, board: MartianChessBoard, player: str, score: int):
+        """Sets the points on a board from one player's score, assuming the game started from the default setup.
+        Captures move material into points and field promotions keep it, so the opponent has the rest"""
+        other = PlayerID.TOP if player == PlayerID.BOTTOM else PlayerID.BOTTOM
+        material = sum(board.get_snapshot().data)
+        board.points[player] = score
+        board.points[other] = self.initial_material - material - score
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a Martian Chess endgame tablebase by retrograde analysis.")
+    parser.add_argument("output", type=str, help="Path of the .npy table to write, metadata goes next to it.")
+    parser.add_argument("--pieces", type=int, default=3, help="Maximum number of pieces on the board (default: 3).")
+    parser.add_argument("--width", type=int, default=4, help="Board width (default: 4).")
+    parser.add_argument("--height", type=int, default=8, help="Board height (default: 8).")
+    args = parser.parse_args()
+    generate_tablebase(args.output, args.width, args.height, args.pieces)
@@ -1,26 +1,70 @@
 import tkinter as tk
+from time import perf_counter
 
 class MartianChessView:
-    def __init__(self):
+    def __init__(
+        self,
+        max_fps: float | None = None,   # Frames drawn per second at most, redraws coming sooner are skipped
+        skip_frames: int = 0,           # Redraws skipped between drawn frames, so only every (skip_frames + 1)th is drawn
+    ):
         self.window = tk.Tk()
         self.images = []
         for img in ["empty.png","pawn.png","drone.png","queen.png"]:
             image = tk.PhotoImage(file=f'game/images/{img}')
             self.images.append(image)
+        self.max_fps = max_fps
+        self.skip_frames = skip_frames
+        self.labels = None # labels[x][y] shows square x,y, created on the first redraw
+        self.shown = None # shown[x][y] is the piece each label currently shows
+        self.frame = 0 # Redraws requested so far
+        self.last_draw_time = 0.0
+        self.missed_frame = False # Whether a skipped redraw may have changed squares that last_move does not cover
 
 
-    def redraw(self, board_state):
-        # Clear window
+    def redraw(self, board_state, last_move: dict | None = None, force: bool = False):
+        """Shows a board state. Only squares that changed are updated: with the move that led to this state
+        (the board's last_move), just its two squares are checked, otherwise the whole board is compared"""
+        self.frame += 1
+        if not force:
+            if self.skip_frames and self.frame % (self.skip_frames + 1):
+                self.missed_frame = True
+                return
+            if self.max_fps and perf_counter() - self.last_draw_time < 1 / self.max_fps:
+                self.missed_frame = True
+                return
+        self.last_draw_time = perf_counter()
+
+        if self.labels is None or len(self.labels) != len(board_state) or len(self.labels[0]) != len(board_state[0]):
+            self._create_grid(len(board_state), len(board_state[0]))
+            self.missed_frame = True
+
+        # Find the squares that may have changed
+        if last_move and "to_x" in last_move and not self.missed_frame:
+            squares = ((last_move["from_x"], last_move["from_y"]), (last_move["to_x"], last_move["to_y"]))
+        else:
+            squares = [(x, y) for x in range(len(board_state)) for y in range(len(board_state[0]))]
+        self.missed_frame = False
+
+        for x, y in squares:
+            value = board_state[x][y]
+            if self.shown[x][y] != value:
+                self.labels[x][y].configure(image=self.images[value])
+                self.shown[x][y] = value
+
+        self.window.update()
+
+
+    def _create_grid(self, width, height):
+        """Replaces any existing widgets with a width by height grid of empty squares"""
         for widget in self.window.winfo_children():
             widget.destroy()
-
-        # Draw board state
-        for x, column in enumerate(board_state):
-            for y, value in enumerate(column):
+        self.labels = [[None] * height for _ in range(width)]
+        self.shown = [[0] * height for _ in range(width)]
+        for x in range(width):
+            for y in range(height):
                 label = tk.Label(
                     self.window,
-                    image=self.images[value]
+                    image=self.images[0]
                 )
                 label.grid(row=y, column=x)  # Place the label in a grid
-
-        self.window.update()
\ No newline at end of file
+                self.labels[x][y] = label
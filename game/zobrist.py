@@ -0,0 +1,54 @@
+import random
+
+
+# Zobrist keys are shared by every board of the same size, keyed by (width, height)
+_ZOBRIST_KEYS = {}
+
+
+def get_zobrist_keys(width, height):
+    """Returns the Zobrist keys for a board of the given size, generating them on first use"""
+    key = (width, height)
+    if key not in _ZOBRIST_KEYS:
+        _ZOBRIST_KEYS[key] = ZobristKeys(width, height)
+    return _ZOBRIST_KEYS[key]
+
+
+class ZobristKeys:
+    """Random 64 bit keys for hashing Martian Chess positions, where squares are numbered x * height + y.
+
+    The hash of a position is the XOR of one key per occupied square, one key for the player who made
+    the last move (so the side to move is covered), and one key for the move forbidden by canal rejection."""
+    squares: int        # Number of squares on the board
+    pieces: list        # pieces[sq][piece] is the key for that piece type on that square (0 for empty)
+    rejections: list    # rejections[from sq * squares + to sq] is the key for that move being rejected
+    players: dict       # Maps playerID to its key, generated on first use
+    height: int         # Height of the board, for numbering squares
+
+
+    def __init__(self, width, height):
+        self.height = height
+        self.squares = width * height
+        rng = random.Random(f"zobrist-{width}x{height}") # Seeded so hashes are stable across runs
+        self.pieces = [[0] + [rng.getrandbits(64) for _ in range(3)] for _ in range(self.squares)]
+        self.rejections = [rng.getrandbits(64) for _ in range(self.squares * self.squares)]
+        self.players = {}
+
+
+    def get_player_key(self, player):
+        """Returns the key for the given player having made the last move"""
+        key = self.players.get(player)
+        if key is None:
+            key = self.players[player] = random.Random(f"zobrist-player-{player}").getrandbits(64)
+        return key
+
+
+    def get_last_move_key(self, last_move: dict):
+        """Returns the combined key for the side to move and canal rejection state described by last_move"""
+        player = last_move.get("player")
+        key = self.get_player_key(player) if player else 0
+        if last_move.get("crosses") == True:
+            # Moving the piece straight back across the canal is illegal
+            from_sq = last_move["to_x"] * self.height + last_move["to_y"]
+            to_sq = last_move["from_x"] * self.height + last_move["from_y"]
+            key ^= self.rejections[from_sq * self.squares + to_sq]
+        return key
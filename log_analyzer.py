@@ -1,67 +1,113 @@
-import csv
 import argparse
-import matplotlib.pyplot as plt
+import json
+import warnings
 import numpy as np
 
-# Function to compute moving average
-def moving_average(data, window_size):
-    return np.convolve(data, np.ones(window_size) / window_size, mode='valid')
+# Codes of the result column of the log
+RESULT_CODES = {b"loss": 0, b"win": 1, b"draw": 2}
 
-# Function to analyze the log file and plot the moving averages
-def analyze_and_plot_log(file_path, window_size):
-    # Initialize variables to store statistics
-    total_games = 0
-    win_count = 0
-    losses = []
-    moves = []
-    wins = []
-
-    win_percentage_over_time = []
-    average_loss_over_time = []
-    average_moves_over_time = []
-    game_indices = []
-
-    # Open the log file and process each row
-    with open(file_path, "r") as file:
-        reader = csv.reader(file)
-        
-        for row in reader:
-            if len(row) != 4:
-                continue  # Skip any malformed lines
-            
-            result, score, move_count, final_loss = row
-            score = int(score)
-            move_count = int(move_count)
-            final_loss = float(final_loss) * 4 # Scaling factor to make it more visible
-
-            # Update game count
-            total_games += 1
-            
-            # Update counts based on result
-            if result == 'win':
-                win_count += 1
-                wins.append(1)
-            else:
-                wins.append(0)
-
-            # Track losses and moves
-            losses.append(final_loss)
-            moves.append(move_count)
-
-            # Track game indices (x-axis)
-            game_indices.append(total_games)
+# Function to parse one chunk of log lines into typed arrays
+def parse_lines(lines):
+    """Parses a list of raw win,score,moves,loss lines (bytes) into (results, scores, moves, losses) arrays, skipping malformed lines"""
+    # Fast path: turn the result column into numbers and let NumPy parse the whole chunk in C.
+    # Only taken when every line has exactly 4 fields, since lines of other lengths could add up to 4 per line
+    raw = b"".join(lines)
+    data = np.frombuffer(raw, np.uint8)
+    line_ends = np.flatnonzero(data == ord("\n"))
+    if len(line_ends) < len(lines):
+        line_ends = np.append(line_ends, len(data))  # Last line without a newline
+    commas = np.concatenate(([0], np.cumsum(data == ord(","))))[line_ends]
+    fields_ok = bool((np.diff(commas, prepend=0) == 3).all())
 
-    # Calculate moving averages
-    if total_games >= window_size:
-        win_percentage_ma = moving_average([w * 100 for w in wins], window_size)
-        average_loss_ma = moving_average(losses, window_size)
-        average_moves_ma = moving_average(moves, window_size)
+    block = raw.rstrip(b"\n") if fields_ok else b""
+    for result, code in RESULT_CODES.items():
+        block = block.replace(result + b",", b"%d," % code)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)  # Raised for text NumPy cannot parse to the end, handled below
+            values = np.fromstring(block.replace(b"\n", b","), dtype=np.float64, sep=",") if block else np.empty(0)
+    except ValueError:
+        values = np.empty(0)
+    if fields_ok and values.size == len(lines) * 4:
+        values = values.reshape(-1, 4)
+        if np.isin(values[:, 0], list(RESULT_CODES.values())).all():
+            return values[:, 0].astype(np.int8), values[:, 1].astype(np.int32), values[:, 2].astype(np.int32), values[:, 3].astype(np.float32)
 
-        # Adjust game indices for moving average
-        game_indices_ma = game_indices[window_size - 1:]
-    else:
-        print(f"Not enough games to calculate a moving average for window size {window_size}.")
-        return
+    # Slow path for chunks with malformed lines, parsing line by line
+    rows = []
+    for line in lines:
+        fields = line.rstrip(b"\n").split(b",")
+        if len(fields) != 4 or fields[0] not in RESULT_CODES:
+            continue  # Skip any malformed lines
+        try:
+            rows.append((RESULT_CODES[fields[0]], int(fields[1]), int(fields[2]), float(fields[3])))
+        except ValueError:
+            continue
+    columns = list(zip(*rows)) or [(), (), (), ()]
+    return np.array(columns[0], np.int8), np.array(columns[1], np.int32), np.array(columns[2], np.int32), np.array(columns[3], np.float32)
+
+# Function to load a log file in chunks, so memory use stays at a few bytes per game
+def load_log(file_path, chunk_bytes=1 << 24):
+    """Returns (results, scores, moves, losses) arrays of every well formed line of the log file"""
+    chunks = []
+    with open(file_path, "rb") as file:
+        while True:
+            lines = file.readlines(chunk_bytes)
+            if not lines:
+                break
+            chunks.append(parse_lines(lines))
+
+    if not chunks:
+        return np.empty(0, np.int8), np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.float32)
+    return tuple(np.concatenate(column) for column in zip(*chunks))
+
+# Function to compute moving average in O(n) with a cumulative sum
+def moving_average(data, window_size, points=None):
+    """Returns (game indices, moving averages) of the window ending at each game, sampled at up to the given number of points.
+    NaN values (such as games without a loss) are left out of their windows instead of making every later average NaN"""
+    cumsum = np.nancumsum(data, dtype=np.float64)
+    counts = np.cumsum(~np.isnan(data), dtype=np.int64)
+    ends = np.arange(window_size - 1, len(data))
+    if points and len(ends) > points:
+        ends = np.unique(np.linspace(window_size - 1, len(data) - 1, points).astype(np.int64))
+    sums = cumsum[ends]
+    valid = counts[ends]
+    starts = ends - window_size
+    sums[starts >= 0] -= cumsum[starts[starts >= 0]]
+    valid[starts >= 0] -= counts[starts[starts >= 0]]
+    with np.errstate(invalid="ignore"):  # Windows without any values average to NaN
+        return ends + 1, sums / valid
+
+# Function to compute summary statistics of the log
+def summarize_log(results, scores, moves, losses, window_size):
+    """Returns a dictionary of summary statistics, overall and over the last window of games"""
+    total_games = len(results)
+    recent = slice(max(total_games - window_size, 0), total_games)
+    def stats(part):
+        count = len(results[part])
+        if count == 0:
+            return {"games": 0}
+        return {
+            "games": count,
+            "win_percentage": float(np.count_nonzero(results[part] == 1) * 100 / count),
+            "draw_percentage": float(np.count_nonzero(results[part] == 2) * 100 / count),
+            "average_score": float(scores[part].mean(dtype=np.float64)),
+            "average_moves": float(moves[part].mean(dtype=np.float64)),
+            "average_loss": float(np.nanmean(losses[part], dtype=np.float64)) if not np.isnan(losses[part]).all() else None,
+        }
+    return {"window": window_size, "overall": stats(slice(None)), "last_window": stats(recent)}
+
+# Function to plot the moving averages, showing them or saving them to a file
+def plot_log(results, moves, losses, window_size, output=None, points=10000):
+    if output:
+        import matplotlib
+        matplotlib.use("Agg")  # Headless, no display needed
+    import matplotlib.pyplot as plt
+
+    # Calculate moving averages
+    game_indices_ma, win_percentage_ma = moving_average((results == 1) * 100, window_size, points)
+    _, average_loss_ma = moving_average(losses * 4, window_size, points)  # Scaling factor to make it more visible
+    _, average_moves_ma = moving_average(moves, window_size, points)
 
     # Plot the results
     plt.figure(figsize=(10, 6))
@@ -76,8 +122,27 @@ def analyze_and_plot_log(file_path, window_size):
     plt.grid(True)
     plt.legend(loc="lower right")
 
-    # Show the plot
-    plt.show()
+    # Show or save the plot
+    if output:
+        plt.savefig(output)
+        print(f"Plot saved to {output}")
+    else:
+        plt.show()
+
+# Function to analyze the log file and plot the moving averages
+def analyze_and_plot_log(file_path, window_size, output=None, summary=None, points=10000):
+    results, scores, moves, losses = load_log(file_path)
+
+    if summary:
+        with open(summary, "w") as file:
+            json.dump(summarize_log(results, scores, moves, losses, window_size), file, indent=4)
+        print(f"Summary saved to {summary}")
+
+    if len(results) < window_size:
+        print(f"Not enough games to calculate a moving average for window size {window_size}.")
+        return
+    if output or not summary:
+        plot_log(results, moves, losses, window_size, output, points)
 
 # Main function to handle argument parsing
 if __name__ == "__main__":
@@ -85,9 +150,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze AI training log file and plot moving averages of win percentage, loss, and moves.")
     parser.add_argument("logfile", type=str, help="Path to the log file.")
     parser.add_argument("--window", type=int, default=10000, help="Window size for moving average (default: 10000 games).")
-    
+    parser.add_argument("--output", type=str, default=None, help="Save the plot to this image file instead of showing it.")
+    parser.add_argument("--summary", type=str, default=None, help="Write summary statistics to this JSON file (the plot is then only made if --output is also given).")
+    parser.add_argument("--points", type=int, default=10000, help="Maximum number of points plotted per line (default: 10000).")
+
     # Parse the arguments
     args = parser.parse_args()
-    
+
     # Analyze the log file and plot results
-    analyze_and_plot_log(args.logfile, args.window)
+    analyze_and_plot_log(args.logfile, args.window, args.output, args.summary, args.points)
@@ -0,0 +1,19 @@
+from functools import partial
+from game.match_runner import MatchRunner
+from players import NeuralnetPlayer, DepthSearchPlayer, GreedyPlayer
+
+
+# Evaluates the current network against the search players using every core. The network does not learn here.
+ai_player = partial(NeuralnetPlayer, "network.pt", learning_rate=0, epsilon=0, weights_save_freq=-1, logging_enabled=False)
+opponents = [
+    GreedyPlayer,
+    partial(DepthSearchPlayer, alpha_beta=True, time_budget=0.05),
+]
+games_per_opponent = 10000
+
+if __name__ == "__main__":
+    for opponent in opponents:
+        print(">> Playing vs " + str(opponent) + " for " + str(games_per_opponent) + " games.")
+        runner = MatchRunner(ai_player, opponent, seed=0)
+        summary = runner.run(games_per_opponent, progress_every=500)
+        print(summary.to_dict())
@@ -0,0 +1,26 @@
+import time
+import numpy as np
+from game.bitboard import BitboardMartianChessBoard
+from players import NeuralnetPlayer
+from players.neuralnet.batch_env import BatchedMartianChessEnv
+
+
+# Plays the network against itself in many games at once, with one forward pass per step for every game
+ai_player = NeuralnetPlayer("network.pt", epsilon=0.03, weights_save_freq=-1, logging_enabled=False)
+env = BatchedMartianChessEnv(256, board_class=BitboardMartianChessBoard)
+
+top_wins = 0
+bottom_wins = 0
+ctr = 0
+start = time.time()
+inputs, masks = env.reset()
+while True:
+    actions = ai_player.select_moves(inputs, masks)
+    inputs, masks, rewards, dones = env.step(actions)
+    if dones.any():
+        finished = np.flatnonzero(dones)
+        ctr += len(finished)
+        top_wins += int((env.winners[finished] == 1).sum())
+        bottom_wins += int((env.winners[finished] == 2).sum())
+        print("Games:", ctr, " | T wins:", top_wins, " | B wins:", bottom_wins, "| Draws:", ctr - top_wins - bottom_wins, "| Games/sec:", int(ctr / (time.time() - start)))
+        inputs, masks = env.reset_done()
@@ -1,5 +1,41 @@
-from .rand.player import RandomPlayer
-from .human.player import HumanPlayer
-from .neuralnet.player import NeuralnetPlayer
-from .depthsearch.player import DepthSearchPlayer
-from .greedy.player import GreedyPlayer
\ No newline at end of file
+import importlib
+
+
+# Players are imported the first time they are used, so that a script which never touches
+# NeuralnetPlayer does not pay for importing torch and numpy.
+_PLAYER_MODULES = {
+    "RandomPlayer": "players.rand.player",
+    "HumanPlayer": "players.human.player",
+    "NeuralnetPlayer": "players.neuralnet.player",
+    "DepthSearchPlayer": "players.depthsearch.player",
+    "GreedyPlayer": "players.greedy.player",
+    "MCTSPlayer": "players.mcts.player",
+}
+
+__all__ = list(_PLAYER_MODULES) + ["get_player_class", "register_player"]
+
+
+def register_player(name: str, module: str):
+    """Registers a player class by name, to be imported from the given module on first access"""
+    _PLAYER_MODULES[name] = module
+    if name not in __all__:
+        __all__.append(name)
+
+
+def get_player_class(name: str):
+    """Returns the player class registered under the given name, importing its module if needed"""
+    if name not in _PLAYER_MODULES:
+        raise KeyError(f"Unknown player: {name}")
+    player_class = getattr(importlib.import_module(_PLAYER_MODULES[name]), name)
+    globals()[name] = player_class # Later lookups skip __getattr__
+    return player_class
+
+
+def __getattr__(name):
+    if name in _PLAYER_MODULES:
+        return get_player_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_PLAYER_MODULES))
@@ -0,0 +1,84 @@
+import atexit
+import multiprocessing
+import struct
+import time
+
+from game.enum import PlayerID
+
+
+# Worker pools are kept alive across moves and games, keyed by (processes, worker player settings)
+_SEARCH_POOLS = {}
+
+# Per-worker state, created once by _init_worker in every pool process
+_worker = {}
+
+# Points of both players, then the last mover and the canal rejected move (from x, from y, to x, to y, or -1s)
+_POSITION_FOOTER = struct.Struct("<hhbbbbb")
+
+
+def pack_position(position):
+    """Serializes the parts of a board that a search depends on: pieces, points, last mover and canal rejection"""
+    last_move = position.last_move
+    if last_move.get("crosses") == True:
+        rejected = (last_move["to_x"], last_move["to_y"], last_move["from_x"], last_move["from_y"])
+    else:
+        rejected = (-1, -1, -1, -1)
+    return position.get_snapshot().data + _POSITION_FOOTER.pack(
+        position.points[PlayerID.TOP], position.points[PlayerID.BOTTOM], last_move.get("player") == PlayerID.TOP, *rejected
+    )
+
+
+def unpack_position(data, board_class, width, height):
+    """Rebuilds a board of the given class from pack_position data"""
+    squares = width * height
+    top_points, bottom_points, top_moved, to_x, to_y, from_x, from_y = _POSITION_FOOTER.unpack_from(data, squares)
+    position = board_class(width, height, False)
+    for sq in range(squares):
+        if data[sq]:
+            position.place(data[sq], *divmod(sq, height))
+    position.points = {PlayerID.TOP: top_points, PlayerID.BOTTOM: bottom_points}
+    position.last_move = {"player": PlayerID.TOP if top_moved else PlayerID.BOTTOM}
+    if to_x >= 0:
+        position.last_move.update({"from_x": from_x, "from_y": from_y, "to_x": to_x, "to_y": to_y, "crosses": True})
+    return position
+
+
+def get_search_pool(processes: int, player_kwargs: dict):
+    """Returns a worker pool whose processes each hold a DepthSearchPlayer built from player_kwargs, starting it on first use.
+    Returns None inside a daemonic process (such as a MatchRunner worker), since those may not start children"""
+    if multiprocessing.current_process().daemon:
+        return None
+    key = (processes, tuple(sorted(player_kwargs.items())))
+    if key not in _SEARCH_POOLS:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(player_kwargs,))
+        atexit.register(pool.terminate)
+        _SEARCH_POOLS[key] = pool
+    return _SEARCH_POOLS[key]
+
+
+def _init_worker(player_kwargs):
+    """Builds this worker's player once, so its transposition table survives between tasks"""
+    from players.depthsearch.player import DepthSearchPlayer
+    _worker["player"] = DepthSearchPlayer(**player_kwargs)
+
+
+def search_subtree(task):
+    """Searches one subtree in a worker. Returns its score for the active player, or None if the deadline passed"""
+    from players.depthsearch.player import SearchTimeout
+    data, player, active_player, depth, deadline = task
+    searcher = _worker["player"]
+    position = unpack_position(data, searcher.board_class, searcher.board_width, searcher.board_height)
+    searcher.active_player = active_player
+    if not searcher.alpha_beta:
+        return searcher.get_best_move(player, position, depth)["score"]
+
+    # The deadline is wall clock time, since perf_counter values cannot be compared between processes
+    searcher.deadline = time.perf_counter() + deadline - time.time() if deadline else None
+    searcher.killer_moves = [[] for _ in range(searcher.max_depth + 1)]
+    searcher.history_scores = {}
+    if searcher.transposition_table:
+        searcher.transposition_table.new_search()
+    try:
+        return searcher.get_best_move_alpha_beta(player, position, depth, -float('inf'), float('inf'), 0)["score"]
+    except SearchTimeout:
+        return None
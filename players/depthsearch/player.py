@@ -1,21 +1,65 @@
-from copy import deepcopy
 import random
+import time
 from game.board import MartianChessBoard
 from game.enum import PlayerID
 from players.base import BasePlayer
+from players.depthsearch.parallel import get_search_pool, pack_position, search_subtree
+from players.depthsearch.transposition import TranspositionTable
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget for a move runs out"""
+    pass
 
 
 class DepthSearchPlayer(BasePlayer):
-    def __init__(self, board_width: int = 4, board_height: int = 8, max_depth: int = 3):
+    def __init__(
+        self,
+        board_width: int = 4,
+        board_height: int = 8,
+        max_depth: int = 3,                 # Deepest search allowed, also the cap for iterative deepening
+        board_class: type = MartianChessBoard,
+        alpha_beta: bool = False,           # Use alpha-beta search with iterative deepening and move ordering
+        time_budget: float | None = None,   # Seconds allowed per move in alpha-beta mode, None for no limit
+        tt_size: int = 1 << 16,             # Transposition table slots for alpha-beta mode, 0 to disable
+        tablebase: str | None = None,       # Endgame tablebase file (see game/tablebase.py), played from instead of searching when it covers the position
+        processes: int = 0,                 # Worker processes the first plies are split across, 0 to search in this process. Ignored
+                                            # (with a warning) inside daemonic processes such as MatchRunner workers, which cannot start children
+        split_depth: int = 1,               # Plies expanded here before handing subtrees to the workers (1 splits the root options)
+    ):
         self.board_width = board_width
         self.board_height = board_height
         self.max_depth = max_depth
+        self.board_class = board_class # Board backend used to simulate positions
+        self.alpha_beta = alpha_beta
+        self.time_budget = time_budget
+        self.transposition_table = TranspositionTable(tt_size) if tt_size > 0 else None
+        self.tablebase = None
+        if tablebase:
+            from game.tablebase import EndgameTablebase # Imported here so searches without a tablebase never load NumPy
+            self.tablebase = EndgameTablebase(tablebase)
+        self.processes = processes
+        self.split_depth = split_depth
+        self.warned_daemonic = False
+        self.tt_size = tt_size
+        self.nodes = 0 # Positions searched for the last move
 
     def make_move(self, board, options, player, score):
         """Makes a move using recursive depth search algorithm"""
         self.active_player = player
+        self.nodes = 0
         position = self.get_position_from_board(board, player)
-        best_move = self.get_best_move(player, position, self.max_depth)
+        if self.tablebase:
+            self.tablebase.fill_points(position, player, score)
+            option_id = self.tablebase.get_best_option(position, player, options)
+            if option_id is not None:
+                return option_id
+        if self.processes:
+            best_move = self.get_best_move_parallel(player, position)
+        elif self.alpha_beta:
+            best_move = self.get_best_move_iterative(player, position)
+        else:
+            best_move = self.get_best_move(player, position, self.max_depth)
         try:
             return options.index(best_move["move"])
         except:
@@ -30,8 +74,8 @@ class DepthSearchPlayer(BasePlayer):
         
     def get_position_from_board(self, board, player):
         """Turn a board state into a MartianChessBoard object"""
-        mcb = MartianChessBoard(self.board_width, self.board_height)
-        mcb.board = deepcopy(board)
+        mcb = self.board_class(self.board_width, self.board_height)
+        mcb.set_board(board)
         mcb.last_move = {"player": self.get_other_player(player)}
         return mcb
     
@@ -45,6 +89,7 @@ class DepthSearchPlayer(BasePlayer):
 
     def get_best_move(self, player, position: MartianChessBoard, depth: int):
         """Recursively determine best move for this player"""
+        self.nodes += 1
         if depth <= 0 or position.is_game_over():
             return {"move": None, "score": self.get_position_value(position)}
 
@@ -55,12 +100,10 @@ class DepthSearchPlayer(BasePlayer):
         random.shuffle(options)
 
         for option in options:
-            # Simulate option
-            mcb = self.get_position_from_board(position.board, player)
-            assert mcb.make_move(player, option[0], option[1], option[2], option[3])
-
-            # Recursively get best move for other player
-            result = self.get_best_move(self.get_other_player(player), mcb, depth - 1)
+            # Simulate option in place, then take it back once the subtree is searched
+            assert position.push_move(player, option[0], option[1], option[2], option[3])
+            result = self.get_best_move(self.get_other_player(player), position, depth - 1)
+            position.pop_move()
 
             # Evaluate outcome
             if player == self.active_player: # Playing as AI
@@ -72,4 +115,191 @@ class DepthSearchPlayer(BasePlayer):
                     best_score = result["score"]
                     best_move = option
 
-        return {"move": best_move, "score": best_score}
\ No newline at end of file
+        return {"move": best_move, "score": best_score}
+
+    def get_best_move_iterative(self, player, position: MartianChessBoard):
+        """Runs alpha-beta searches of increasing depth until max_depth or the time budget, returning the last completed result"""
+        self.deadline = time.perf_counter() + self.time_budget if self.time_budget else None
+        self.killer_moves = [[] for _ in range(self.max_depth + 1)] # Up to two moves per ply that caused a cutoff
+        self.history_scores = {} # Cutoff counts per move, weighted by remaining depth
+        self.nodes = 0
+        if self.transposition_table:
+            self.transposition_table.new_search()
+
+        best_move = {"move": None, "score": self.get_position_value(position)}
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_move = self.get_best_move_alpha_beta(player, position, depth, -float('inf'), float('inf'), 0, best_move["move"])
+            except SearchTimeout:
+                # The half searched position is thrown away, so there are no moves to pop
+                break
+            if abs(best_move["score"]) == float('inf'):
+                break # The result is already forced, searching deeper will not change it
+        return best_move
+
+    def get_best_move_parallel(self, player, position: MartianChessBoard):
+        """Searches the subtrees after the first split_depth plies in the worker pool and merges their scores.
+        In alpha-beta mode, this deepens one ply at a time until max_depth or the time budget, like get_best_move_iterative.
+        Falls back to searching in this process where no pool can be started"""
+        pool = get_search_pool(self.processes, {
+            "board_width": self.board_width,
+            "board_height": self.board_height,
+            "max_depth": self.max_depth,
+            "board_class": self.board_class,
+            "alpha_beta": self.alpha_beta,
+            "tt_size": self.tt_size,
+        })
+        if pool is None:
+            # Inside a daemonic process, such as a MatchRunner worker, which may not start a pool
+            if not self.warned_daemonic:
+                print("Warning: DepthSearchPlayer cannot start worker processes inside a daemonic process, searching in this process instead")
+                self.warned_daemonic = True
+            return self.get_best_move_iterative(player, position) if self.alpha_beta else self.get_best_move(player, position, self.max_depth)
+        if not self.alpha_beta:
+            return self.run_split_search(pool, player, position, self.max_depth, None)
+
+        deadline = time.time() + self.time_budget if self.time_budget else None
+        best_move = {"move": None, "score": self.get_position_value(position)}
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_move = self.run_split_search(pool, player, position, depth, deadline)
+            except SearchTimeout:
+                break
+            if abs(best_move["score"]) == float('inf'):
+                break # The result is already forced, searching deeper will not change it
+        return best_move
+
+    def run_split_search(self, pool, player, position: MartianChessBoard, depth: int, deadline: float | None):
+        """Searches a position to the given depth with the subtrees below split_depth plies spread over the pool"""
+        tasks = []
+        tree = self.split_position(player, position, depth, self.split_depth, deadline, tasks)
+        scores = pool.map(search_subtree, tasks, chunksize=1)
+        if None in scores:
+            raise SearchTimeout()
+        return self.merge_split_scores(tree, scores)
+
+    def split_position(self, player, position: MartianChessBoard, depth: int, plies: int, deadline: float | None, tasks: list):
+        """Expands the first plies of a search into a tree of (player, [(option, subtree)]) nodes. Subtrees become
+        ("task", index into tasks) for the pool, or ("score", score) where the search already ends"""
+        self.nodes += 1
+        if depth <= 0 or position.is_game_over():
+            return ("score", self.get_position_value(position))
+        if plies <= 0:
+            tasks.append((pack_position(position), player, self.active_player, depth, deadline))
+            return ("task", len(tasks) - 1)
+
+        options = position.get_player_options(player)
+        random.shuffle(options)
+        children = []
+        for option in options:
+            assert position.push_move(player, option[0], option[1], option[2], option[3])
+            children.append((option, self.split_position(self.get_other_player(player), position, depth - 1, plies - 1, deadline, tasks)))
+            position.pop_move()
+        return (player, children)
+
+    def merge_split_scores(self, tree, scores):
+        """Minimax over a tree from split_position, given the score of every task"""
+        kind, children = tree
+        if kind == "score":
+            return {"move": None, "score": children}
+        if kind == "task":
+            return {"move": None, "score": scores[children]}
+
+        maximizing = kind == self.active_player
+        best_score = -float('inf') if maximizing else float('inf')
+        best_move = None
+        for option, subtree in children:
+            score = self.merge_split_scores(subtree, scores)["score"]
+            if maximizing and score > best_score or not maximizing and score < best_score:
+                best_score = score
+                best_move = option
+        return {"move": best_move, "score": best_score}
+
+    def get_best_move_alpha_beta(self, player, position: MartianChessBoard, depth: int, alpha: float, beta: float, ply: int, first_move=None):
+        """Alpha-beta version of get_best_move, searching first_move before any other option"""
+        self.nodes += 1
+        if self.deadline and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if depth <= 0 or position.is_game_over():
+            return {"move": None, "score": self.get_position_value(position)}
+
+        # Reuse a previous search of this position if it went deep enough
+        table = self.transposition_table
+        if table:
+            key = self.get_position_key(position)
+            entry = table.probe(key)
+            if entry:
+                entry_depth, bound, score, move = entry
+                if entry_depth >= depth:
+                    if bound == TranspositionTable.EXACT:
+                        return {"move": move, "score": score}
+                    if bound == TranspositionTable.LOWER and score >= beta or bound == TranspositionTable.UPPER and score <= alpha:
+                        return {"move": move, "score": score}
+                first_move = first_move or move
+            original_alpha, original_beta = alpha, beta
+
+        maximizing = player == self.active_player
+        options = self.order_options(player, position, position.get_player_options(player), ply, first_move)
+        if not options: # No legal moves, so there is nothing to search
+            return {"move": None, "score": self.get_position_value(position)}
+        best_score = -float('inf') if maximizing else float('inf')
+        best_move = options[0]
+
+        for option in options:
+            assert position.push_move(player, option[0], option[1], option[2], option[3])
+            result = self.get_best_move_alpha_beta(self.get_other_player(player), position, depth - 1, alpha, beta, ply + 1)
+            position.pop_move()
+
+            # Evaluate outcome
+            if maximizing: # Playing as AI
+                if result["score"] > best_score:
+                    best_score = result["score"]
+                    best_move = option
+                alpha = max(alpha, best_score)
+            else: # Playing as opponent
+                if result["score"] < best_score:
+                    best_score = result["score"]
+                    best_move = option
+                beta = min(beta, best_score)
+
+            if alpha >= beta:
+                # The other player will never allow this line, remember the refutation for move ordering
+                if position.get_space(option[2], option[3]) == 0:
+                    killers = self.killer_moves[ply]
+                    if option not in killers:
+                        killers.insert(0, option)
+                        del killers[2:]
+                self.history_scores[option] = self.history_scores.get(option, 0) + depth * depth
+                break
+
+        if table:
+            if best_score <= original_alpha:
+                bound = TranspositionTable.UPPER
+            elif best_score >= original_beta:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+            table.store(key, depth, bound, best_score, best_move)
+        return {"move": best_move, "score": best_score}
+
+    def get_position_key(self, position: MartianChessBoard):
+        """Transposition table key for a position. Scores are absolute points, so the points are part of the key"""
+        return (position.get_hash(), position.points[PlayerID.TOP], position.points[PlayerID.BOTTOM], self.active_player)
+
+    def order_options(self, player, position: MartianChessBoard, options, ply: int, first_move=None):
+        """Sorts options so that likely best moves are searched first: first_move, captures by value, killers, then history"""
+        killers = self.killer_moves[ply]
+        history_scores = self.history_scores
+
+        def priority(option):
+            if option == first_move:
+                return 1000000
+            target = position.get_space(option[2], option[3])
+            if target > 0 and not position.check_piece_ownership(player, option[2], option[3]):
+                return 100000 * target # Capture, most valuable piece first
+            if option in killers:
+                return 10000 - killers.index(option)
+            return min(history_scores.get(option, 0), 9999)
+
+        options.sort(key=priority, reverse=True)
+        return options
@@ -0,0 +1,56 @@
+class TranspositionTable:
+    """Fixed size hash table of search results, indexed by position key.
+
+    Entries live in parallel lists so the table never grows past the number of slots chosen at creation.
+    When two positions share a slot, the entry searched to a greater depth is kept, unless it was stored
+    during an earlier move (a previous generation), in which case the newer result always replaces it."""
+    EXACT = 0   # Score is the exact minimax value
+    LOWER = 1   # Score is a lower bound (the search failed high)
+    UPPER = 2   # Score is an upper bound (the search failed low)
+
+    size: int           # Number of slots, always a power of two
+    generation: int     # Incremented once per move so stale entries can be replaced
+
+
+    def __init__(self, size: int = 1 << 16):
+        # Round down to a power of two so a slot is found with a mask instead of a modulo
+        self.size = 1 << max(size, 1).bit_length() - 1
+        self.mask = self.size - 1
+        self.generation = 0
+        self.clear()
+
+
+    def clear(self):
+        """Removes every entry from the table"""
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.bounds = [0] * self.size
+        self.scores = [0] * self.size
+        self.moves = [None] * self.size
+        self.generations = [0] * self.size
+
+
+    def new_search(self):
+        """Marks every entry stored so far as belonging to a previous search"""
+        self.generation += 1
+
+
+    def probe(self, key):
+        """Returns (depth, bound, score, move) stored for the given key, or None if it is not in the table"""
+        slot = hash(key) & self.mask
+        if self.keys[slot] != key:
+            return None
+        return self.depths[slot], self.bounds[slot], self.scores[slot], self.moves[slot]
+
+
+    def store(self, key, depth: int, bound: int, score: float, move):
+        """Stores a search result, keeping a deeper result from the current search if the slot is taken"""
+        slot = hash(key) & self.mask
+        if self.keys[slot] is not None and self.keys[slot] != key and self.generations[slot] == self.generation and self.depths[slot] > depth:
+            return
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = move
+        self.generations[slot] = self.generation
@@ -1,25 +1,26 @@
 # Player base model, a foundational class for an actual player to be built upon.
-from copy import deepcopy
 from game.board import MartianChessBoard
 from game.enum import PlayerID
 from players.base import BasePlayer
 
 
 class GreedyPlayer(BasePlayer):
-    def __init__(self, board_width: int = 4, board_height: int = 8, max_depth: int = 3):
+    def __init__(self, board_width: int = 4, board_height: int = 8, max_depth: int = 3, board_class: type = MartianChessBoard):
         self.board_width = board_width
         self.board_height = board_height
         self.max_depth = max_depth
+        self.board_class = board_class # Board backend used to simulate positions
         
     def make_move(self, board, options, player, score):
         """The heart of any player, this will be called with the current board state, list of legal moves that the player can make, your player ID, and current score. 
         Return the options list index of the move you would like to make and the game will do it."""
         greediest_option = None
         greediest_score = -1
+        position = self.get_position_from_board(board, player)
         for id, option in enumerate(options):
-            position = self.get_position_from_board(board, player)
-            position.make_move(player, option[0], option[1], option[2], option[3])
+            position.push_move(player, option[0], option[1], option[2], option[3])
             score = position.points[player]
+            position.pop_move()
             if score > greediest_score:
                 greediest_option = id
                 greediest_score = score
@@ -35,7 +36,7 @@ class GreedyPlayer(BasePlayer):
         
     def get_position_from_board(self, board, player):
         """Turn a board state into a MartianChessBoard object"""
-        mcb = MartianChessBoard(self.board_width, self.board_height)
-        mcb.board = deepcopy(board)
+        mcb = self.board_class(self.board_width, self.board_height)
+        mcb.set_board(board)
         mcb.last_move = {"player": self.get_other_player(player)}
         return mcb
\ No newline at end of file
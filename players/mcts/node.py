@@ -0,0 +1,30 @@
+class MCTSNode:
+    """One position in the search tree.
+
+    visits and value_sum are seen from the player who made the move into this node, so a parent picks
+    the child with the best value for itself. Both include pending virtual losses while a leaf below
+    the node waits for its batched evaluation."""
+    __slots__ = ("player", "prior", "visits", "value_sum", "children", "pending", "terminal_value")
+
+    player: str                 # PlayerID of the player to move in this position
+    prior: float                # Prior probability of the move into this node, from the network
+    visits: float               # Completed visits plus pending virtual losses
+    value_sum: float            # Sum of backed up values, from the perspective of the player who moved into this node
+    children: dict | None       # Maps (from_x, from_y, to_x, to_y) to child nodes, None until the node is expanded
+    pending: bool               # Whether this leaf is waiting in the current evaluation batch
+    terminal_value: float | None # Exact value for the player to move if the game is over here
+
+
+    def __init__(self, player: str, prior: float = 0.0):
+        self.player = player
+        self.prior = prior
+        self.visits = 0
+        self.value_sum = 0.0
+        self.children = None
+        self.pending = False
+        self.terminal_value = None
+
+
+    def get_value(self):
+        """Average value of this node for the player who moved into it, 0 if it has not been visited"""
+        return self.value_sum / self.visits if self.visits else 0.0
@@ -0,0 +1,226 @@
+import math
+import time
+
+import numpy as np
+import torch
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from players.base import BasePlayer
+from players.mcts.node import MCTSNode
+from players.neuralnet.player import NeuralnetPlayer
+
+
+class MCTSPlayer(BasePlayer):
+    def __init__(
+        self,
+        weights_file: str | None = None,    # Weights for the NeuralnetPlayer network used to score leaves
+        network_player: NeuralnetPlayer | None = None, # Optionally, share the network of an existing NeuralnetPlayer instead
+        board_width: int = 4,
+        board_height: int = 8,
+        time_budget: float = 1.0,           # Seconds of search per move
+        max_simulations: int | None = None, # Optional cap on simulations per move, mostly for reproducible runs
+        batch_size: int = 16,               # Leaves gathered (with virtual loss) per batched forward pass
+        c_puct: float = 1.5,                # Exploration constant, higher values trust the priors more than the values
+        virtual_loss: float = 1.0,          # Losses temporarily added to a path while its leaf waits for evaluation
+        prior_temperature: float = 0.1,     # Softmax temperature turning network outputs into move priors
+        score_weight: float = 0.5,          # Weight of the point difference in leaf values, the rest comes from the network
+        score_scale: float = 6.0,           # Point difference that counts as a clear advantage
+        reuse_tree: bool = True,            # Keep the subtree of the position reached on the next turn
+        board_class: type = MartianChessBoard,
+    ):
+        self.board_width = board_width
+        self.board_height = board_height
+        self.time_budget = time_budget
+        self.max_simulations = max_simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.prior_temperature = prior_temperature
+        self.score_weight = score_weight
+        self.score_scale = score_scale
+        self.reuse_tree = reuse_tree
+        self.board_class = board_class # Board backend used to simulate positions
+
+        # Borrow the network and move space of a NeuralnetPlayer
+        if network_player is None:
+            network_player = NeuralnetPlayer(weights_file, board_width=board_width, board_height=board_height, learning_rate=0, weights_save_freq=-1, logging_enabled=False)
+        self.network = network_player.network
+        self.move_space = network_player.move_space
+        self.piece_types = np.arange(1, 4)[:, None, None]
+
+        self.board = None # Position of the root, kept in step with the game so points and canal rejection are exact
+        self.root = None
+        self.simulations = 0 # Simulations run for the last move
+        self.batches = 0 # Batched forward passes run for the last move
+
+
+    def make_move(self, board, options, player, score):
+        """Searches the position until the time budget runs out and plays the most visited move"""
+        self.simulations = self.batches = 0
+        self.advance_root(board, player, score)
+
+        # The root is always expanded from the referee's options, which also know about canal rejection
+        if self.root.children is None:
+            self.run_batch()
+        self.root.children = {option: self.root.children.get(option) or MCTSNode(self.get_other_player(player)) for option in options}
+
+        deadline = time.perf_counter() + self.time_budget
+        while time.perf_counter() < deadline and (self.max_simulations is None or self.simulations < self.max_simulations):
+            self.run_batch()
+
+        # Play the most visited move, breaking ties by value
+        best_move = max(options, key=lambda option: (self.root.children[option].visits, self.root.children[option].get_value()))
+        self.board.make_move(player, best_move[0], best_move[1], best_move[2], best_move[3])
+        self.board.move_stack = []
+        self.root = self.root.children[best_move] if self.reuse_tree else None
+        return options.index(best_move)
+
+
+    def game_over(self, winner, score):
+        """Forgets the tree, the next game starts a new one"""
+        self.board = None
+        self.root = None
+
+
+    def get_other_player(self, player_id):
+        """Returns the other player ID when the current player is provided"""
+        if player_id == PlayerID.BOTTOM:
+            return PlayerID.TOP
+        else:
+            return PlayerID.BOTTOM
+
+
+    def advance_root(self, board, player, score):
+        """Moves the root to the position the referee gives us, reusing the subtree of the opponent's move if there is one"""
+        other = self.get_other_player(player)
+        if self.board is not None:
+            # Find which opponent move leads from our last position to this one
+            target = self.board_class(self.board_width, self.board_height)
+            target.set_board(board)
+            for option in self.board.get_player_options(other):
+                self.board.push_move(other, option[0], option[1], option[2], option[3])
+                found = self.board.board_hash == target.board_hash
+                self.board.pop_move()
+                if found:
+                    self.board.make_move(other, option[0], option[1], option[2], option[3])
+                    self.board.move_stack = []
+                    children = self.root.children if self.root is not None else None
+                    self.root = children.get(option) if children else None
+                    if self.root is None:
+                        self.root = MCTSNode(player)
+                    return
+
+        # Unknown position, such as the first move of a game. The opponent's points and canal rejection are not known
+        self.board = self.board_class(self.board_width, self.board_height)
+        self.board.set_board(board)
+        self.board.points[player] = score
+        self.board.last_move = {"player": other}
+        self.root = MCTSNode(player)
+
+
+    def run_batch(self):
+        """Selects up to batch_size leaves with virtual loss, then evaluates them in one forward pass and backs up their values"""
+        leaves = []
+        for _ in range(self.batch_size):
+            path, moves = self.select()
+            leaf = path[-1]
+            if leaf.terminal_value is not None:
+                self.backup(path, leaf.terminal_value)
+            elif leaf.pending:
+                self.revert_virtual_loss(path) # Another path in this batch already waits on this leaf
+                break
+            else:
+                leaf.pending = True
+                leaves.append((path, moves))
+            self.simulations += 1
+            if self.max_simulations is not None and self.simulations >= self.max_simulations:
+                break
+        if leaves:
+            self.evaluate(leaves)
+
+
+    def select(self):
+        """Walks from the root to a leaf, adding virtual loss along the way. Returns the path of nodes and the moves between them"""
+        node = self.root
+        path = [node]
+        moves = []
+        node.visits += self.virtual_loss
+        while node.children:
+            sqrt_visits = math.sqrt(node.visits)
+            best_score = -math.inf
+            for move, child in node.children.items():
+                score = child.get_value() + self.c_puct * child.prior * sqrt_visits / (1 + child.visits)
+                if score > best_score:
+                    best_score, best_move, best_child = score, move, child
+            node = best_child
+            node.visits += self.virtual_loss
+            node.value_sum -= self.virtual_loss
+            path.append(node)
+            moves.append(best_move)
+        return path, moves
+
+
+    def revert_virtual_loss(self, path):
+        """Takes back the virtual loss a path added during selection"""
+        path[0].visits -= self.virtual_loss
+        for node in path[1:]:
+            node.visits -= self.virtual_loss
+            node.value_sum += self.virtual_loss
+
+
+    def backup(self, path, value):
+        """Adds the value of a leaf (for the player to move at the leaf) to every node on its path, replacing the virtual loss"""
+        leaf_player = path[-1].player
+        path[0].visits += 1 - self.virtual_loss
+        for node in path[1:]:
+            mover = self.get_other_player(node.player)
+            node.visits += 1 - self.virtual_loss
+            node.value_sum += self.virtual_loss + (value if mover == leaf_player else -value)
+
+
+    def evaluate(self, leaves):
+        """Expands the leaves at the end of a list of (path, moves) pairs using one batched forward pass, then backs up their values"""
+        inputs = np.zeros((len(leaves), 3 * self.board_width * self.board_height), dtype=np.float32)
+        positions = []
+        for row, (path, moves) in enumerate(leaves):
+            # Play the path's moves on the root board to reach the leaf position
+            for node, move in zip(path, moves):
+                self.board.push_move(node.player, move[0], move[1], move[2], move[3])
+            player = path[-1].player
+            winner = self.board.is_game_over()
+            options = [] if winner else self.board.get_player_options(player)
+            points = self.board.points[player] - self.board.points[self.get_other_player(player)]
+            if options:
+                board_array = np.asarray(self.board.get_snapshot())
+                if player != PlayerID.TOP:
+                    board_array = board_array[::-1, ::-1] # The network always sees the board from the top player's side
+                inputs[row] = (board_array[None, :, :] == self.piece_types).ravel()
+            positions.append((winner, options, points))
+            for _ in moves:
+                self.board.pop_move()
+
+        with torch.inference_mode():
+            outputs = self.network(torch.from_numpy(inputs)).numpy()
+        self.batches += 1
+
+        for (path, moves), output, (winner, options, points) in zip(leaves, outputs, positions):
+            leaf = path[-1]
+            leaf.pending = False
+            if winner or not options:
+                # The game is over here (a player with no moves left cannot continue either)
+                leaf.terminal_value = 1.0 if winner == leaf.player else -1.0
+                self.backup(path, leaf.terminal_value)
+                continue
+
+            # Priors are a softmax of the network's move values, the position value comes from the best of them
+            move_index = self.move_space.move_index if leaf.player == PlayerID.TOP else self.move_space.rotated_move_index
+            move_values = output[[move_index[option] for option in options]]
+            priors = np.exp((move_values - move_values.max()) / self.prior_temperature)
+            priors /= priors.sum()
+            network_value = 2 * float(np.clip(move_values.max(), 0, 1)) - 1
+            value = (1 - self.score_weight) * network_value + self.score_weight * math.tanh(points / self.score_scale)
+
+            other = self.get_other_player(leaf.player)
+            leaf.children = {option: MCTSNode(other, float(prior)) for option, prior in zip(options, priors)}
+            self.backup(path, value)
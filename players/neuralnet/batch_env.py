@@ -0,0 +1,147 @@
+import numpy as np
+
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.movespace import get_move_space
+
+
+class BatchedMartianChessEnv:
+    """Advances many Martian Chess games in lockstep for batched self-play.
+
+    Every game is played by a MartianChessBoard, so canal rejection, field promotion, scoring and the
+    game over tie-break follow the normal rules. Board states, points and results are mirrored into
+    NumPy arrays so that each step produces one (K, input size) network input and one (K, move space)
+    legal move mask. Like NeuralnetPlayer, inputs and moves are always seen from the top player's side,
+    so boards and moves are rotated 180 degrees for games where the bottom player is to move."""
+    num_games: int          # Number of games (K) played in lockstep
+    boards: np.ndarray      # (K, width, height) piece values of every game
+    points: np.ndarray      # (K, 2) points of the top and bottom player
+    top_to_move: np.ndarray # (K,) True where the top player is to move
+    move_counts: np.ndarray # (K,) moves made in each game
+    done: np.ndarray        # (K,) True where the game has finished
+    winners: np.ndarray     # (K,) 1 if top won, 2 if bottom won, 0 for an unfinished game or a draw
+
+
+    def __init__(
+        self,
+        num_games: int,
+        board_width: int = 4,
+        board_height: int = 8,
+        move_limit: int = 200,                  # Games reaching this many moves are draws, as in MartianChessReferee
+        first_player: str = PlayerID.BOTTOM,
+        board_class: type = MartianChessBoard,  # Rules backend, such as BitboardMartianChessBoard
+    ):
+        self.num_games = num_games
+        self.board_width = board_width
+        self.board_height = board_height
+        self.move_limit = move_limit
+        self.first_player = first_player
+
+        self.move_space = get_move_space(board_width, board_height)
+        self.games = [board_class(board_width, board_height) for _ in range(num_games)]
+
+        self.boards = np.zeros((num_games, board_width, board_height), dtype=np.int8)
+        self.points = np.zeros((num_games, 2), dtype=np.int32)
+        self.top_to_move = np.zeros(num_games, dtype=bool)
+        self.move_counts = np.zeros(num_games, dtype=np.int32)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.winners = np.zeros(num_games, dtype=np.int8)
+        self.masks = np.zeros((num_games, len(self.move_space)), dtype=bool)
+        self.options = [[] for _ in range(num_games)] # Legal options of each game, in board coordinates
+
+
+    def reset(self):
+        """Starts every game from the default position, returning (inputs, masks)"""
+        for game_id in range(self.num_games):
+            self._reset_game(game_id)
+        return self.get_inputs(), self.masks
+
+
+    def reset_done(self):
+        """Starts a new game in place of every finished game, returning (inputs, masks)"""
+        for game_id in np.flatnonzero(self.done):
+            self._reset_game(game_id)
+        return self.get_inputs(), self.masks
+
+
+    def _reset_game(self, game_id):
+        game = self.games[game_id]
+        game.reset_board()
+        self.boards[game_id] = game.board
+        self.points[game_id] = 0
+        self.top_to_move[game_id] = self.first_player == PlayerID.TOP
+        self.move_counts[game_id] = 0
+        self.done[game_id] = False
+        self.winners[game_id] = 0
+        self._update_options(game_id)
+
+
+    def _update_options(self, game_id):
+        """Generates the legal options of a game and writes its row of the legal move mask"""
+        mask = self.masks[game_id]
+        mask[:] = False
+        if self.done[game_id]:
+            self.options[game_id] = []
+            return
+        player = PlayerID.TOP if self.top_to_move[game_id] else PlayerID.BOTTOM
+        options = self.games[game_id].get_player_options(player)
+        self.options[game_id] = options
+        mask[self.move_space.get_indices(options, rotated=player != PlayerID.TOP)] = True
+
+
+    def get_inputs(self):
+        """Returns the (K, 3 * width * height) one hot network input of every game, from the side to move"""
+        rotated = self.boards[:, ::-1, ::-1]
+        boards = np.where(self.top_to_move[:, None, None], self.boards, rotated)
+        piece_types = np.arange(1, 4, dtype=np.int8)[None, :, None, None]
+        one_hot = boards[:, None, :, :] == piece_types # (K, piece type, x, y), as in flat_one_hot_encode_board
+        inputs = one_hot.reshape(self.num_games, -1).astype(np.float32)
+        inputs[self.done] = 0
+        return inputs
+
+
+    def step(self, actions):
+        """Plays one move-space index per game (ignored for finished games). Returns (inputs, masks, rewards, dones),
+        where rewards are the points each mover scored with this move"""
+        rewards = np.zeros(self.num_games, dtype=np.int32)
+        w, h = self.board_width - 1, self.board_height - 1
+        for game_id in np.flatnonzero(~self.done):
+            action = int(actions[game_id])
+            if not self.masks[game_id, action]:
+                raise ValueError(f"Illegal action {action} for game {game_id}")
+
+            # Turn the move back into board coordinates
+            from_x, from_y, to_x, to_y = self.move_space[action]
+            top = self.top_to_move[game_id]
+            if not top:
+                from_x, from_y, to_x, to_y = w - from_x, h - from_y, w - to_x, h - to_y
+            player = PlayerID.TOP if top else PlayerID.BOTTOM
+            game = self.games[game_id]
+            before = game.points[player]
+            if not game.make_move(player, from_x, from_y, to_x, to_y):
+                raise Exception(f"Supposedly legal move was not able to be made: {(from_x, from_y, to_x, to_y)}. Active player: {player}")
+
+            # Mirror the changed squares and points into the arrays
+            self.boards[game_id, from_x, from_y] = 0
+            self.boards[game_id, to_x, to_y] = game.get_space(to_x, to_y)
+            rewards[game_id] = game.points[player] - before
+            self.points[game_id, 0 if top else 1] = game.points[player]
+            self.move_counts[game_id] += 1
+
+            # Check for game over, then the move limit
+            winner = game.is_game_over()
+            if winner:
+                self.done[game_id] = True
+                self.winners[game_id] = 1 if winner == PlayerID.TOP else 2
+            elif self.move_counts[game_id] == self.move_limit:
+                self.done[game_id] = True # Draw
+            else:
+                self.top_to_move[game_id] = not top
+            self._update_options(game_id)
+
+        return self.get_inputs(), self.masks, rewards, self.done.copy()
+
+
+    def get_options(self, game_id):
+        """Returns the legal options of a game in board coordinates, in the order the referee would give them"""
+        return self.options[game_id]
@@ -1,15 +1,16 @@
 import os
-import pdb
 import random
 import time
 
 import numpy as np
-import scipy
 import torch
 import torch.nn as nn
 
+from game.movespace import get_move_space
 from players.base import BasePlayer
+from players.neuralnet.replay import ReplayBuffer
 from players.neuralnet.utils import NeuralPlayerUtils
+from players.neuralnet.writer import get_background_writer, save_checkpoint, append_log
 from game.enum import PlayerID
 
 class NeuralnetPlayer(BasePlayer):
@@ -34,12 +35,26 @@ class NeuralnetPlayer(BasePlayer):
         num_piece_types: int = 3,           # Special parameter for adapting player to other games
         weights_save_freq: int = 100,       # How often to save weights to file in number of games
         logging_enabled: bool = True,       # Whether or not the player will create a training log file (Requires weight persistence)
+        batch_learning: bool = False,       # Learn from a whole game in batched passes instead of one transition at a time
+        learn_batch_size: int | None = None,# Minibatch size for batched learning, None to use the whole game as one batch
+        learn_epochs: int = 1,              # Number of passes over the game memory for batched learning
+        target_clamp: tuple = (0.02, 0.98), # Target Q values are clamped to this range for stability
+        replay_dir: str | None = None,      # Optionally, a directory for a persistent memory-mapped experience replay buffer
+        replay_capacity: int = 1000000,     # Maximum number of transitions kept in the replay buffer
+        replay_batch_size: int = 256,       # Number of transitions sampled from the replay buffer per minibatch
+        replay_batches: int = 1,            # Number of replay minibatches to learn from after each game
+        fast_inference: bool = False,       # Choose moves with preallocated buffers, no-grad inference and NumPy masking
+        trace_network: bool = False,        # Use a traced TorchScript graph of the network for fast inference
+        background_io: bool = True,         # Save weights and write the training log on a background thread
+        keep_checkpoints: int = 1,          # Number of numbered weight checkpoints to keep next to the weights file (1 keeps only the weights file)
     ):
         # Set player parameters
         self.weights_file = weights_file
         self.weights_save_freq = weights_save_freq
         self.weights_save_counter = weights_save_freq
         self.logging_enabled = logging_enabled
+        self.keep_checkpoints = keep_checkpoints
+        self.background_io = background_io
 
         self.gamma = gamma
         self.epsilon = epsilon
@@ -54,6 +69,13 @@ class NeuralnetPlayer(BasePlayer):
         self.win_lose_reward = win_lose_reward
         self.final_reward_weight = final_reward_weight
         self.static_loss_offset = static_loss_offset
+        self.batch_learning = batch_learning
+        self.learn_batch_size = learn_batch_size
+        self.learn_epochs = learn_epochs
+        self.target_clamp = target_clamp
+        self.replay_batch_size = replay_batch_size
+        self.replay_batches = replay_batches
+        self.fast_inference = fast_inference
 
         self.board_width = board_width
         self.board_height = board_height
@@ -63,11 +85,11 @@ class NeuralnetPlayer(BasePlayer):
         self.last_decision_move_id = None # For storing the last move we made
         self.last_position = (0,0,0,0) # For storing the position of the last piece we moved
         self.move_count = 0 # For keeping track of how many moves we are into this game
-        self.training_log = "" # For caching training information to be written to the log file
+        self.training_log = [] # For caching lines of training information to be written to the log file
         self.consecutive_losses = 0 # Reset consecutive loss counter
 
         # Generate move space
-        self.move_space = NeuralPlayerUtils.get_all_possible_moves(board_width, board_height)
+        self.move_space = get_move_space(board_width, board_height)
         board_spaces = board_width * board_height
         input_size = board_spaces * num_piece_types
 
@@ -83,6 +105,22 @@ class NeuralnetPlayer(BasePlayer):
         )
         self.optimizer = torch.optim.NAdam(self.network.parameters(), lr=learning_rate, betas=(0.8, 0.99))
 
+        # Prepare the fast inference path: an input buffer shared between NumPy and torch, and move space lookups
+        self.input_buffer = torch.zeros(input_size)
+        self.input_array = self.input_buffer.numpy()
+        self.move_mask = np.zeros(len(self.move_space)) # Legal move mask buffer, all zeros between calls
+        self.piece_types = np.arange(1, num_piece_types + 1)[:, None, None]
+        self.move_index = self.move_space.move_index
+        self.rotated_move_index = self.move_space.rotated_move_index
+        self.inference_network = self.network
+        if trace_network: # The traced graph shares its parameters with self.network, so learning still applies
+            self.inference_network = torch.jit.trace(self.network, self.input_buffer, check_trace=False)
+
+        # Open the experience replay buffer if provided
+        self.replay_buffer = None
+        if replay_dir:
+            self.replay_buffer = ReplayBuffer(replay_dir, replay_capacity, input_size, len(self.move_space))
+
         # Load network weights from file if provided
         if weights_file:
             if os.path.exists(weights_file):
@@ -103,6 +141,8 @@ class NeuralnetPlayer(BasePlayer):
     
     def learn(self, game_final_reward):
         # Learn from the results of a game
+        if self.batch_learning:
+            return self.learn_batched(game_final_reward)
         loss_fn = nn.MSELoss()
         loss = 0
 
@@ -127,7 +167,7 @@ class NeuralnetPlayer(BasePlayer):
                 masked_next_q_values = next_q_values * torch.FloatTensor(next_move_mask) # Mask future rewards with legal moves
                 max_next_q_value = torch.max(masked_next_q_values) # Take the highest value from the next Q tensor
                 target_q_value = reward + (self.gamma * max_next_q_value * (1-final_memory)) # Calculate target Q value from state reward and future reward
-                target_q_value = torch.clamp(target_q_value, min=0.02, max=0.98) # Clamp target Q value for stability
+                target_q_value = torch.clamp(target_q_value, min=self.target_clamp[0], max=self.target_clamp[1]) # Clamp target Q value for stability
 
             # Calculate loss
             # print(predicted_q_value, target_q_value)
@@ -146,12 +186,106 @@ class NeuralnetPlayer(BasePlayer):
         return float(loss)
 
 
+    def learn_batched(self, game_final_reward):
+        # Learn from the results of a game with batched forward passes, one optimizer step per minibatch
+        if len(self.game_memory) == 0:
+            return 0.0
+        states, actions, rewards, next_states, next_move_masks = zip(*self.game_memory) # Unpack memories
+        finals = np.zeros(len(self.game_memory), dtype=np.float32)
+        finals[-1] = 1 # Only the last memory of the game has no future reward
+
+        loss = self.train_on_batch(
+            np.stack(states), np.array(actions), np.array(rewards), np.stack(next_states), np.stack(next_move_masks), finals, game_final_reward
+        )
+        self.game_memory.clear() # Clear memory to prepare for next game
+        return loss
+
+
+    def train_on_batch(self, states, actions, rewards, next_states, next_move_masks, finals, final_reward):
+        # Fit the network to the target Q values of a batch of transitions, in minibatches of learn_batch_size
+        states = torch.as_tensor(states, dtype=torch.float32)
+        actions = torch.as_tensor(actions, dtype=torch.int64)
+        rewards = torch.as_tensor(rewards, dtype=torch.float32)
+        next_states = torch.as_tensor(next_states, dtype=torch.float32)
+        next_move_masks = torch.as_tensor(next_move_masks, dtype=torch.float32)
+        finals = torch.as_tensor(finals, dtype=torch.float32)
+        loss_scale = 1 - (final_reward * self.final_reward_weight)
+
+        # Compute every target Q value in one pass
+        with torch.no_grad():
+            next_q_values = self.forward(next_states) * next_move_masks # Mask future rewards with legal moves
+            max_next_q_values = torch.max(next_q_values, dim=1).values
+            target_q_values = rewards + (self.gamma * max_next_q_values * (1 - finals))
+            target_q_values = torch.clamp(target_q_values, min=self.target_clamp[0], max=self.target_clamp[1]) # Clamp target Q values for stability
+
+        batch_size = self.learn_batch_size or len(states)
+        loss = torch.zeros(())
+        for epoch in range(self.learn_epochs):
+            order = torch.randperm(len(states)) if batch_size < len(states) else torch.arange(len(states))
+            for start in range(0, len(states), batch_size):
+                batch = order[start:start + batch_size]
+                predicted_q_values = self.forward(states[batch]).gather(1, actions[batch].unsqueeze(1)).squeeze(1)
+                loss = nn.functional.mse_loss(predicted_q_values, target_q_values[batch]) * loss_scale
+
+                # Update network
+                self.optimizer.zero_grad()
+                loss.backward()
+                self.optimizer.step()
+
+        return float(loss.detach())
+
+
+    def remember_game(self):
+        # Copy the transitions of the current game into the replay buffer, marking the last one as final
+        for id, (state, action, reward, next_state, next_move_mask) in enumerate(self.game_memory):
+            self.replay_buffer.append(state, action, reward, next_state, next_move_mask, id == len(self.game_memory) - 1)
+        self.replay_buffer.flush()
+
+
+    def learn_from_replay(self):
+        # Learn from minibatches sampled uniformly from every game in the replay buffer
+        loss = 0.0
+        if len(self.replay_buffer) == 0:
+            return loss
+        for i in range(self.replay_batches):
+            states, actions, rewards, next_states, next_move_masks, finals = self.replay_buffer.sample(self.replay_batch_size)
+            loss = self.train_on_batch(states, actions, rewards, next_states, next_move_masks, finals, 0)
+        return loss
+
+
     def compute_entropy(self, probs):
         entropy = -torch.sum(probs * torch.log(probs + 1e-10))  # Add a tiny value to prevent taking the log of zero
         return entropy
 
 
-    def make_move(self, board, options, player, score):
+    def select_moves(self, inputs, masks):
+        # Choose one move space index for each row of a batch of flat boards and legal move masks (such as the
+        # output of BatchedMartianChessEnv), using a single forward pass for the whole batch
+        with torch.no_grad():
+            decision_arrays = self.network(torch.from_numpy(np.asarray(inputs, dtype=np.float32))).numpy()
+        batch_size = len(decision_arrays)
+
+        # Greedy choice is the best legal move
+        masked_decision_arrays = np.where(masks, decision_arrays, -np.inf)
+        choices = np.argmax(masked_decision_arrays, axis=1)
+
+        # Otherwise choose according to the probability distribution of positive legal weights
+        positive_weights = np.where(masks, np.maximum(decision_arrays, 0), 0)
+        totals = positive_weights.sum(axis=1)
+        thresholds = np.random.random(batch_size) * totals
+        sampled = (np.cumsum(positive_weights, axis=1) < thresholds[:, None]).sum(axis=1)
+        use_sampled = (np.random.random(batch_size) >= self.greedy) & (totals > 0)
+        choices = np.where(use_sampled, np.minimum(sampled, masks.shape[1] - 1), choices)
+
+        # Occasionally make a random legal move
+        for row in np.flatnonzero(np.random.random(batch_size) < self.epsilon):
+            legal = np.flatnonzero(masks[row])
+            if len(legal):
+                choices[row] = np.random.choice(legal)
+        return choices
+
+
+    def choose_move(self, board, options, player):
         # If we are not the top player, rotate the board and options
         if player != PlayerID.TOP:
             board = NeuralPlayerUtils.rotate_board(board)
@@ -199,6 +333,60 @@ class NeuralnetPlayer(BasePlayer):
         if random_move:
             decision_option_id = random.randint(0, len(options)-1)
 
+        return flat_board, move_mask, chosen_decision_move_id, decision_option_id, options
+
+
+    def choose_move_fast(self, board, options, player):
+        # Same decision as choose_move, using preallocated buffers, no-grad inference and NumPy masking instead of Python lists.
+        # Options stay in board coordinates, bottom player moves are looked up in the rotated move index instead.
+        board_array = np.asarray(board) # Zero copy for referee board snapshots
+        if player != PlayerID.TOP:
+            board_array = board_array[::-1, ::-1]
+        move_index = self.move_index if player == PlayerID.TOP else self.rotated_move_index
+
+        # Encode the board straight into the network input buffer
+        self.input_array[:] = (board_array[None, :, :] == self.piece_types).ravel()
+        flat_board = self.input_array.copy() # The buffer is reused, so memory needs its own copy
+
+        with torch.inference_mode():
+            decision_array = self.inference_network(self.input_buffer).numpy()
+
+        # Only look at the values of legal moves
+        legal_move_ids = np.fromiter((move_index[option] for option in options), dtype=np.int64, count=len(options))
+        legal_decisions = decision_array[legal_move_ids]
+        random_move = random.random() < self.epsilon
+        greedy_move = random.random() < self.greedy
+
+        if greedy_move:
+            decision_option_id = int(np.argmax(legal_decisions))
+        else:
+            # Choose according to the probability distribution of positive weights
+            cumulative_weights = np.cumsum(np.maximum(legal_decisions, 0))
+            if cumulative_weights[-1] <= 0:
+                random_move = True # No legal move has a confidence above zero
+                decision_option_id = 0
+            else:
+                decision_option_id = int(np.searchsorted(cumulative_weights, random.random() * cumulative_weights[-1], side="right"))
+                decision_option_id = min(decision_option_id, len(options) - 1)
+        chosen_decision_move_id = int(legal_move_ids[decision_option_id])
+
+        if random_move:
+            decision_option_id = random.randint(0, len(options)-1)
+
+        # Fill the mask buffer in place, then clear only the indices that were set, so it is all zeros again
+        self.move_mask[legal_move_ids] = 1
+        move_mask = self.move_mask.copy() # The buffer is reused, so memory needs its own copy
+        self.move_mask[legal_move_ids] = 0
+        return flat_board, move_mask, chosen_decision_move_id, decision_option_id
+
+
+    def make_move(self, board, options, player, score):
+        # Choose a move with either the fast inference path or the original one
+        if self.fast_inference:
+            flat_board, move_mask, chosen_decision_move_id, decision_option_id = self.choose_move_fast(board, options, player)
+        else:
+            flat_board, move_mask, chosen_decision_move_id, decision_option_id, options = self.choose_move(board, options, player)
+
         # Calculate state reward
         reward = score - self.last_score
         self.last_score = score
@@ -241,7 +429,11 @@ class NeuralnetPlayer(BasePlayer):
         #     final_reward -= self.time_penalty * (self.move_count - self.time_target)
 
         # Learn from rewards
+        if self.replay_buffer is not None:
+            self.remember_game() # Store this game's transitions before learn clears them
         final_loss = self.learn(final_reward/30) # Divide by 30 to bring it more into a -1 to 1 range
+        if self.replay_buffer is not None:
+            self.learn_from_replay()
 
         self.epsilon *= self.epsilon_decay
         self.epsilon = max(self.epsilon, 0.01)
@@ -249,7 +441,7 @@ class NeuralnetPlayer(BasePlayer):
         # Log training if enabled
         if self.logging_enabled:
             winner_str = "win" if winner else ("draw" if score == -100 else "loss")
-            self.training_log += f"{winner_str},{score},{self.move_count},{final_loss}\n"
+            self.training_log.append(f"{winner_str},{score},{self.move_count},{final_loss}\n")
 
         # Reset game specific counters
         self.last_score = 0 # Reset last score counter
@@ -261,14 +453,21 @@ class NeuralnetPlayer(BasePlayer):
         if self.weights_file:
             self.weights_save_counter -= 1 # Decrement save counter
             if self.weights_save_counter == 0:
-                # Save weights
+                # Save weights, atomically and on the background writer thread if enabled
                 self.weights_save_counter = self.weights_save_freq # Reset counter
-                torch.save(self.network.state_dict(), self.weights_file)
-                print(f"Network weights saved to {self.weights_file}")
+                writer = get_background_writer() if self.background_io else None
+                if writer:
+                    writer.save_checkpoint(self.network.state_dict(), self.weights_file, self.keep_checkpoints)
+                    print(f"Network weights queued to be saved to {self.weights_file}")
+                else:
+                    save_checkpoint(self.network.state_dict(), self.weights_file, self.keep_checkpoints)
+                    print(f"Network weights saved to {self.weights_file}")
 
                 # Log training if enabled
                 if self.logging_enabled:
                     logfile = self.weights_file.split(".")[0] + ".log"
-                    with open(logfile, "a") as log:
-                        log.write(self.training_log)
-                    self.training_log = ""
\ No newline at end of file
+                    if writer:
+                        writer.append_log(logfile, self.training_log)
+                    else:
+                        append_log(logfile, self.training_log)
+                    self.training_log = []
\ No newline at end of file
@@ -0,0 +1,103 @@
+import json
+import os
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """Fixed capacity ring buffer of transitions, stored in memory-mapped NumPy files in a directory.
+
+    One hot board states and legal move masks are bit packed, so a 4x8 transition takes about 60 bytes
+    on disk. The files outlive the process: opening the same directory again picks up where it left off."""
+    directory: str          # Directory holding the .npy files and meta.json
+    capacity: int           # Maximum number of transitions kept, the oldest are overwritten first
+    state_size: int         # Length of a flat one hot board state
+    move_space_size: int    # Length of a legal move mask
+    position: int           # Index the next transition will be written to
+    size: int               # Number of transitions currently stored
+
+
+    def __init__(self, directory: str, capacity: int, state_size: int, move_space_size: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.state_size = state_size
+        self.move_space_size = move_space_size
+        self.position = 0
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Resume an existing buffer if there is one
+        meta_file = os.path.join(directory, "meta.json")
+        exists = os.path.exists(meta_file)
+        if exists:
+            with open(meta_file) as file:
+                meta = json.load(file)
+            if (meta["capacity"], meta["state_size"], meta["move_space_size"]) != (capacity, state_size, move_space_size):
+                raise ValueError(f"Replay buffer in {directory} was created with different dimensions: {meta}")
+            self.position = meta["position"]
+            self.size = meta["size"]
+
+        packed_state_size = (state_size + 7) // 8
+        packed_mask_size = (move_space_size + 7) // 8
+        self.states = self._open("states", (capacity, packed_state_size), np.uint8, exists)
+        self.actions = self._open("actions", (capacity,), np.int32, exists)
+        self.rewards = self._open("rewards", (capacity,), np.float32, exists)
+        self.next_states = self._open("next_states", (capacity, packed_state_size), np.uint8, exists)
+        self.next_move_masks = self._open("next_move_masks", (capacity, packed_mask_size), np.uint8, exists)
+        self.finals = self._open("finals", (capacity,), np.uint8, exists)
+        self.flush()
+
+
+    def _open(self, name, shape, dtype, exists):
+        """Opens (or creates) one memory-mapped array of the buffer"""
+        path = os.path.join(self.directory, name + ".npy")
+        if exists:
+            return np.lib.format.open_memmap(path, mode="r+")
+        return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+    def __len__(self):
+        return self.size
+
+
+    def append(self, state, action: int, reward: float, next_state, next_move_mask, final: bool = False):
+        """Adds one transition, overwriting the oldest one once the buffer is full"""
+        i = self.position
+        self.states[i] = np.packbits(np.asarray(state) > 0)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = np.packbits(np.asarray(next_state) > 0)
+        self.next_move_masks[i] = np.packbits(np.asarray(next_move_mask) > 0)
+        self.finals[i] = final
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+
+    def sample(self, batch_size: int):
+        """Returns a uniformly sampled minibatch (states, actions, rewards, next states, next move masks, finals)"""
+        indices = np.sort(np.random.randint(0, self.size, size=min(batch_size, self.size))) # Sorted for sequential reads
+        return (
+            np.unpackbits(self.states[indices], axis=1, count=self.state_size).astype(np.float32),
+            np.array(self.actions[indices]),
+            np.array(self.rewards[indices]),
+            np.unpackbits(self.next_states[indices], axis=1, count=self.state_size).astype(np.float32),
+            np.unpackbits(self.next_move_masks[indices], axis=1, count=self.move_space_size).astype(np.float32),
+            self.finals[indices].astype(np.float32),
+        )
+
+
+    def flush(self):
+        """Writes pending changes and the ring buffer position to disk"""
+        for array in (self.states, self.actions, self.rewards, self.next_states, self.next_move_masks, self.finals):
+            array.flush()
+        meta = {
+            "capacity": self.capacity,
+            "state_size": self.state_size,
+            "move_space_size": self.move_space_size,
+            "position": self.position,
+            "size": self.size,
+        }
+        meta_file = os.path.join(self.directory, "meta.json")
+        with open(meta_file + ".tmp", "w") as file:
+            json.dump(meta, file)
+        os.replace(meta_file + ".tmp", meta_file)
@@ -1,32 +1,13 @@
 from copy import deepcopy
-import pdb
-from typing import OrderedDict
 import numpy as np
-from game.board import MartianChessBoard
-from game.enum import PlayerID
+from game.movespace import MoveSpace, get_move_space
 
 
 class NeuralPlayerUtils:
     @staticmethod
     def get_all_possible_moves(board_width, board_height):
         """Return a list of all possible move coordinates on the given board size in a list of format (from_x, from_y, to_x, to_y)"""
-        # Setup an empty board
-        board = MartianChessBoard(board_width, board_height, False)
-        width = board.width
-        height = board.height
-
-        # Gather all moves by iterating piece types in every location
-        all_moves = []
-        for x in range(width):
-            for y in range(height):
-                for piece in range(3):
-                    board.place(piece+1, x, y) # Place this type of piece at X/Y
-                    all_moves.extend(board.get_player_options(PlayerID.TOP)) # Add all moves for this player
-                    board.place(0, x, y) # Remove the piece we placed
-
-        # Gather unique elements from that huge list
-        unique_moves = list(OrderedDict.fromkeys(all_moves))
-        return unique_moves
+        return list(get_move_space(board_width, board_height).moves) # Cached per board size, in process and on disk
     
     @staticmethod
     def flat_one_hot_encode_board(board):
@@ -45,6 +26,8 @@ class NeuralPlayerUtils:
     @staticmethod
     def generate_move_mask(move_space, options):
         """Creates a mask of 1s and 0s representing which moves in the move space are legal options at this time"""
+        if isinstance(move_space, MoveSpace):
+            return move_space.get_mask(options) # Scatter the option indices instead of scanning the move space
         options_set = set(options) # Convert options to a set for faster access
         mask = [1 if move in options_set else 0 for move in move_space]
         return np.array(mask)
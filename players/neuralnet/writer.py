@@ -0,0 +1,143 @@
+import atexit
+import glob
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+import torch
+
+
+# One writer thread is shared by every player in the process, created on first use
+_BACKGROUND_WRITER = None
+
+
+def get_background_writer():
+    """Returns the process wide BackgroundWriter, starting its thread on first use (or again in a forked child process)"""
+    global _BACKGROUND_WRITER
+    if _BACKGROUND_WRITER is None or not _BACKGROUND_WRITER.thread.is_alive():
+        _BACKGROUND_WRITER = BackgroundWriter()
+        atexit.register(_BACKGROUND_WRITER.close) # Finish pending writes before the interpreter exits
+    return _BACKGROUND_WRITER
+
+
+def save_checkpoint(state_dict: dict, path: str, keep: int = 1):
+    """Saves a state dict atomically, so a crash or power loss mid-save leaves the previous file intact.
+
+    With keep > 1, numbered copies (network.1.pt, network.2.pt, ...) of the last keep checkpoints are kept next to it"""
+    # Write a uniquely named temporary file next to the checkpoint, so concurrent saves never share one,
+    # and make sure its data is on disk before it replaces the previous checkpoint
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False) as temp:
+        try:
+            torch.save(state_dict, temp)
+            temp.flush()
+            os.fsync(temp.fileno())
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+    temp_path = temp.name
+    if os.path.exists(path):
+        shutil.copymode(path, temp_path) # Temporary files are only readable by their owner
+    else:
+        os.chmod(temp_path, 0o644)
+
+    if keep > 1:
+        root, ext = os.path.splitext(path)
+        numbered = _get_numbered_checkpoints(root, ext)
+        number = numbered[-1][0] + 1 if numbered else 1
+        try:
+            os.link(temp_path, f"{root}.{number}{ext}") # Shares the data with the main file instead of writing it twice
+        except OSError:
+            shutil.copyfile(temp_path, f"{root}.{number}{ext}")
+            _fsync_path(f"{root}.{number}{ext}")
+        for _, old_path in numbered[:max(len(numbered) + 1 - keep, 0)]:
+            os.remove(old_path)
+    os.replace(temp_path, path)
+    _fsync_path(directory) # Makes the rename itself durable
+
+
+def _fsync_path(path):
+    """Flushes a file or directory to disk, where the platform allows it (directories cannot be opened on Windows)"""
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _get_numbered_checkpoints(root, ext):
+    """Returns sorted (number, path) pairs of the numbered checkpoints of a weights file"""
+    numbered = []
+    for path in glob.glob(glob.escape(root) + ".*" + ext):
+        number = path[len(root) + 1:len(path) - len(ext)]
+        if number.isdigit():
+            numbered.append((int(number), path))
+    return sorted(numbered)
+
+
+def append_log(path: str, lines: list):
+    """Appends lines of text to a log file"""
+    with open(path, "a") as log:
+        log.writelines(lines)
+
+
+class BackgroundWriter:
+    """Thread that performs checkpoint saves and log writes taken from a queue, in the order they were submitted,
+    so the game loop never waits on the disk"""
+    tasks: queue.Queue  # Queue of (function, args) to run, None stops the thread
+
+
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self.thread.start()
+
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                function(*args)
+            except Exception as error: # A failed write must not kill the thread, later saves may still succeed
+                print(f"Warning: Background write failed: {error}")
+            finally:
+                self.tasks.task_done()
+
+
+    def submit(self, function, *args):
+        """Queues a function to be run on the writer thread"""
+        if not self.thread.is_alive():
+            raise RuntimeError("Background writer has been closed")
+        self.tasks.put((function, args))
+
+
+    def save_checkpoint(self, state_dict: dict, path: str, keep: int = 1):
+        """Queues an atomic save of a snapshot of the state dict, so training can continue changing the weights"""
+        snapshot = {key: value.detach().clone() for key, value in state_dict.items()}
+        self.submit(save_checkpoint, snapshot, path, keep)
+
+
+    def append_log(self, path: str, lines: list):
+        """Queues lines of text to be appended to a log file"""
+        self.submit(append_log, path, list(lines))
+
+
+    def flush(self):
+        """Waits until every queued write has finished"""
+        self.tasks.join()
+
+
+    def close(self):
+        """Finishes every queued write and stops the thread"""
+        if self.thread.is_alive():
+            self.tasks.put(None)
+            self.thread.join()
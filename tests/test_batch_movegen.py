@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+from game.batch_movegen import get_batch_move_generator, get_rejected_move
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+from game.movespace import get_move_space
+
+
+def get_playout_positions(width, height, games, seed):
+    """Plays random games and returns (board, player to move, rejected move, options) at every turn"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        board = MartianChessBoard(width, height)
+        player = rng.choice([PlayerID.TOP, PlayerID.BOTTOM])
+        for _ in range(200):
+            options = board.get_player_options(player)
+            positions.append(([list(column) for column in board.board], player, get_rejected_move(board), options))
+            if not options:
+                break
+            board.make_move(player, *rng.choice(options))
+            if board.is_game_over():
+                break
+            player = PlayerID.BOTTOM if player == PlayerID.TOP else PlayerID.TOP
+    return positions
+
+
+# Board sizes with an even height, where every move of both players has an index in the move space
+@pytest.mark.parametrize("width, height", [(4, 8), (5, 6), (6, 6)])
+def test_legal_masks_match_scalar_engine(width, height):
+    positions = get_playout_positions(width, height, games=20, seed=width * 100 + height)
+    assert any(rejected[0] >= 0 for _, _, rejected, _ in positions) # Canal rejections are covered
+
+    generator = get_batch_move_generator(width, height)
+    move_space = get_move_space(width, height)
+    boards = np.array([board for board, _, _, _ in positions])
+    top_to_move = np.array([player == PlayerID.TOP for _, player, _, _ in positions])
+    rejected = np.array([rejected for _, _, rejected, _ in positions])
+    masks = generator.get_legal_masks(boards, top_to_move, rejected)
+
+    for mask, (_, player, _, options) in zip(masks, positions):
+        expected = move_space.get_mask(options, rotated=player == PlayerID.BOTTOM)
+        assert np.array_equal(mask, expected.astype(bool))
+
+
+def test_rejected_move_is_removed():
+    board = MartianChessBoard(4, 8)
+    generator = get_batch_move_generator(4, 8)
+    boards = np.array([board.board])
+    top_to_move = np.array([True])
+    mask = generator.get_legal_masks(boards, top_to_move)[0]
+    move = board.get_player_options(PlayerID.TOP)[0]
+
+    # Pretend the bottom player just crossed the canal with the piece now making this move
+    board.last_move = {"player": PlayerID.BOTTOM, "from_x": move[2], "from_y": move[3], "to_x": move[0], "to_y": move[1], "crosses": True}
+    rejected_mask = generator.get_legal_masks(boards, top_to_move, np.array([get_rejected_move(board)]))[0]
+
+    index = get_move_space(4, 8).move_index[move]
+    assert mask[index] and not rejected_mask[index]
+    assert np.count_nonzero(mask) == np.count_nonzero(rejected_mask) + 1
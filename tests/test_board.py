@@ -0,0 +1,17 @@
+import pytest
+
+from game.bitboard import BitboardMartianChessBoard
+from game.board import MartianChessBoard
+from game.enum import PlayerID
+
+
+@pytest.mark.parametrize("board_class", [MartianChessBoard, BitboardMartianChessBoard])
+@pytest.mark.parametrize("move", [(-1, 0, 3, 1), (4, 0, 3, 0), (0, 8, 0, 7), (0, -1, 0, 0), (1, 3, 1, 4), (0, 0, 0, -1), (0, 0, -1, 1)])
+def test_out_of_bounds_and_empty_moves_are_rejected(board_class, move):
+    board = board_class()
+    before = [list(column) for column in board.board]
+    assert not board.make_move(PlayerID.TOP, *move)
+    assert not board.push_move(PlayerID.TOP, *move)
+    assert board.board == before
+    assert board.points == {PlayerID.TOP: 0, PlayerID.BOTTOM: 0}
+    assert board.last_move == {}
@@ -0,0 +1,37 @@
+import numpy as np
+
+from log_analyzer import moving_average, parse_lines
+
+
+def test_well_formed_lines():
+    results, scores, moves, losses = parse_lines([b"win,3,40,0.5\n", b"loss,-2,61,0.25\n", b"draw,0,200,nan"])
+    assert results.tolist() == [1, 0, 2]
+    assert scores.tolist() == [3, -2, 0]
+    assert moves.tolist() == [40, 61, 200]
+    assert losses[:2].tolist() == [0.5, 0.25] and np.isnan(losses[2])
+
+
+def test_malformed_lines_are_skipped():
+    # Field counts that add up to 4 per line must not be parsed as two games
+    assert all(len(column) == 0 for column in parse_lines([b"win,1,2,3,0\n", b"win,1,2\n"]))
+
+    lines = [b"win,1,2,0.5\n", b"win,1,2,3,0\n", b"\n", b"tie,1,2,0.5\n", b"loss,x,2,0.5\n", b"win,1,2\n", b"loss,4,5,0.75\n"]
+    results, scores, moves, losses = parse_lines(lines)
+    assert results.tolist() == [1, 0]
+    assert scores.tolist() == [1, 4]
+    assert moves.tolist() == [2, 5]
+    assert losses.tolist() == [0.5, 0.75]
+
+
+def test_moving_average_skips_nan():
+    data = np.array([1.0, np.nan, 3.0, 5.0, np.nan, np.nan, 7.0])
+    indices, averages = moving_average(data, 2)
+    assert indices.tolist() == [2, 3, 4, 5, 6, 7]
+    assert averages[:3].tolist() == [1.0, 3.0, 4.0]
+    assert averages[3] == 5.0 and np.isnan(averages[4]) and averages[5] == 7.0
+
+
+def test_moving_average_matches_mean():
+    data = np.arange(20) % 7
+    indices, averages = moving_average(data, 5, points=4)
+    assert np.allclose(averages, [data[end - 5:end].mean() for end in indices])